@@ -0,0 +1,744 @@
+import hashlib
+import json
+import logging
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, time, timedelta
+from functools import wraps
+
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    request,
+    jsonify,
+    make_response,
+    stream_with_context,
+)
+from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
+
+import db_profiles
+import db_routing
+import instrumentation
+import job_export
+import job_import
+import job_listing
+import materials_catalog
+import pricing_sweep
+import messages
+import rate_profiles
+import similar_jobs
+import timeseries
+import user_cache
+import user_stats
+from extensions import db
+from models import Job, JobMaterial
+from pricing_cents import parse_fields, изчисли_за_профил
+from pricing_engine import изчисли_пакет, quote_cache
+
+
+bp = Blueprint("api", __name__)
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# CONDITIONAL GET (ETAG)
+# =========================
+
+def etag_by_data_version(view):
+    """Answer If-None-Match with 304 before the view runs any query.
+
+    The tag combines the user id, their data version and the query
+    string, so it changes whenever save_job / delete_job touch the data.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = user_stats.data_version(current_user.id)
+
+        tag = f"u{current_user.id}-v{version}"
+        if request.query_string:
+            digest = hashlib.sha1(request.query_string).hexdigest()[:12]
+            tag = f"{tag}-{digest}"
+
+        if request.if_none_match.contains(tag):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(tag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    return wrapper
+
+
+def publish_change(broker, user_id):
+    broker.publish(f"user:{user_id}", "changed")
+
+
+def notify_data_changed(user_id):
+    """Tell stream subscribers the user's jobs changed (after commit)."""
+    publish_change(current_app.extensions["broker"], user_id)
+
+
+def after_job_saved(user_id, job_id, description, materials, notify=True):
+    """Post-commit side effects of a save.
+
+    The job is already committed, so a failing hook is logged and never
+    changes the response (a client seeing an error would save it twice).
+    """
+    hooks = [
+        ("materials catalog", materials_catalog.record, (user_id, materials)),
+        ("similar jobs", similar_jobs.index.job_saved,
+         (user_id, job_id, description, [m["name"] for m in materials])),
+    ]
+    if notify:
+        hooks.insert(0, ("notify", notify_data_changed, (user_id,)))
+
+    for name, hook, args in hooks:
+        try:
+            hook(*args)
+        except Exception:
+            logger.exception("save of job %s: %s hook failed", job_id, name)
+
+
+# =========================
+# HEALTH CHECK
+# =========================
+
+@bp.route("/health")
+def health():
+    return jsonify({"status": "ok"})
+
+
+@bp.route("/health/db")
+def health_db():
+    # pool internals: gated like /metrics, not public like /health
+    if not instrumentation.authorized():
+        return instrumentation.unauthorized()
+
+    engines = {"primary": db_profiles.describe(db.engine, current_app.config["DB_PROFILE"])}
+    if db_routing.REPLICA in db.engines:
+        engines[db_routing.REPLICA] = db_profiles.describe(
+            db.engines[db_routing.REPLICA],
+            current_app.config["DB_REPLICA_PROFILE"],
+            db_routing.REPLICA,
+        )
+    return jsonify(engines)
+
+
+# =========================
+# API: CALCULATE OFFER
+# =========================
+
+def _body_option(data, key):
+    return data.get(key) if isinstance(data, dict) else None
+
+
+@bp.route("/api/izchisli", methods=["POST"])
+@login_required
+def izchisli():
+    data = request.get_json()
+
+    # ?fields=final_price,income.total_profit&locale=en (or the same keys in the body)
+    try:
+        fields = parse_fields(request.args.get("fields", _body_option(data, "fields")))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    locale = request.args.get("locale", _body_option(data, "locale")) or messages.DEFAULT_LOCALE
+    if locale not in messages.TEMPLATES:
+        return jsonify({"error": f"unknown locale: {locale}"}), 400
+
+    try:
+        profile = rate_profiles.store.for_user(current_user.id, current_user.plan)
+        result = изчисли_за_профил(data, profile, fields, locale)
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+MAX_SWEEP_SOLVES = 20
+
+
+@bp.route("/api/izchisli/sweep", methods=["POST"])
+@login_required
+def izchisli_sweep():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "expected a JSON object"}), 400
+
+    targets = data.get("solve", [])
+    if isinstance(targets, dict):
+        targets = [targets]
+    if not isinstance(targets, list) or len(targets) > MAX_SWEEP_SOLVES:
+        return jsonify({"error": f"solve takes up to {MAX_SWEEP_SOLVES} targets"}), 400
+
+    profile = rate_profiles.store.for_user(current_user.id, current_user.plan)
+
+    try:
+        result = pricing_sweep.sweep(
+            data, data.get("grid") or {}, profile, data.get("columns")
+        )
+        result["solve"] = []
+        for target in targets:
+            try:
+                result["solve"].append(pricing_sweep.solve(data, profile, target))
+            except ValueError as e:
+                result["solve"].append({**target, "error": str(e)})
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(result), 200
+
+
+@bp.route("/api/izchisli/cache")
+@login_required
+def izchisli_cache_stats():
+    return jsonify(quote_cache.stats())
+
+
+@bp.route("/api/cache")
+def cache_stats():
+    # process-wide counters across all tenants: gated like /metrics
+    if not instrumentation.authorized():
+        return instrumentation.unauthorized()
+
+    return jsonify({
+        "materials": materials_catalog.stats(),
+        "quotes": quote_cache.stats(),
+        "rate_profiles": rate_profiles.store.stats(),
+        "users": user_cache.cache.stats()
+    })
+
+
+MAX_BATCH_JOBS = 5000
+
+
+@bp.route("/api/izchisli/batch", methods=["POST"])
+@login_required
+def izchisli_batch():
+    data = request.get_json(silent=True)
+
+    # accept a bare list or {"jobs": [...]}
+    jobs = data.get("jobs") if isinstance(data, dict) else data
+
+    if not isinstance(jobs, list):
+        return jsonify({"error": "expected a list of jobs"}), 400
+
+    if len(jobs) > MAX_BATCH_JOBS:
+        return jsonify({
+            "error": f"too many jobs (max {MAX_BATCH_JOBS})"
+        }), 413
+
+    try:
+        profile = rate_profiles.store.for_user(current_user.id, current_user.plan)
+        results = изчисли_пакет(jobs, settings=profile.as_settings())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({"count": len(results), "results": results}), 200
+
+
+# =========================
+# API: SAVE OFFER / JOB
+# =========================
+
+@bp.route("/api/jobs", methods=["POST"])
+@login_required
+def save_job():
+    data = request.get_json()
+
+    if current_app.extensions["group_commit"] is not None:
+        return save_job_grouped(data)
+
+    try:
+        fields, materials = job_import.parse_job(data)
+
+        job = Job(user_id=current_user.id, **fields)
+
+        db.session.add(job)
+        db.session.flush()
+        job_id = job.id
+
+        materials_total = 0.0
+
+        for m in materials:
+            db.session.add(JobMaterial(job_id=job_id, **m))
+            materials_total += m["total_price"]
+
+        db.session.flush()
+        user_stats.apply_delta(
+            current_user.id,
+            jobs=1,
+            profit=job.profit_amount,
+            revenue=job.final_price,
+            materials=materials_total,
+        )
+
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+
+    db_routing.mark_write()
+    after_job_saved(current_user.id, job_id, fields["description"], materials)
+
+    return jsonify({"status": "saved", "job_id": job_id}), 201
+
+
+def save_job_grouped(data):
+    try:
+        fields, materials = job_import.parse_job(data)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    committer = current_app.extensions["group_commit"]
+    future = committer.submit(current_user.id, fields, materials)
+
+    try:
+        job_id = future.result(timeout=current_app.config["GROUP_COMMIT_TIMEOUT"])
+    except FutureTimeoutError:
+        # the job may still land; the client should re-check before retrying
+        return jsonify({"error": "save is taking too long"}), 503
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    db_routing.mark_write()
+    # the committer's on_commit hook already notified subscribers
+    after_job_saved(current_user.id, job_id, fields["description"], materials, notify=False)
+    return jsonify({"status": "saved", "job_id": job_id}), 201
+
+
+# =========================
+# API: CALCULATE AND SAVE (ONE REQUEST)
+# =========================
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_IDEMPOTENCY_KEY = 64
+
+
+SAVED_QUOTE_FIELDS = (
+    "final_price", "total_cost", "profit_amount", "client_message", "engine_version",
+)
+
+
+def _saved_quote(job_id, fields, status, replayed=False):
+    return jsonify({
+        "status": "saved",
+        "job_id": job_id,
+        "replayed": replayed,
+        **{name: fields[name] for name in SAVED_QUOTE_FIELDS}
+    }), status
+
+
+def _replay(job):
+    fields = {name: getattr(job, name) for name in SAVED_QUOTE_FIELDS}
+    return _saved_quote(job.id, fields, 200, replayed=True)
+
+
+def _job_for_key(key):
+    if key is None:
+        return None
+    return Job.query.filter_by(user_id=current_user.id, idempotency_key=key).first()
+
+
+def _request_hash(data):
+    body = {name: value for name, value in data.items() if name != "idempotency_key"}
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _replay_or_conflict(job, request_hash):
+    # jobs saved before hashes were stored can only be replayed
+    if job.idempotency_hash not in (None, request_hash):
+        return jsonify({
+            "error": "idempotency key was already used for a different request",
+            "job_id": job.id,
+        }), 422
+    return _replay(job)
+
+
+@bp.route("/api/quotes", methods=["POST"])
+@login_required
+def create_quote():
+    """Price the inputs server-side and save the job in one transaction.
+
+    Totals are always recomputed; a posted ``client_message`` (the user's
+    edited text) is the only output kept from the client. With an
+    ``Idempotency-Key`` header (or ``idempotency_key`` in the body) a
+    retry returns the job the first request saved instead of a duplicate;
+    reusing a key with a different body is a 422.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "expected a JSON object"}), 400
+
+    key = request.headers.get(IDEMPOTENCY_HEADER, data.get("idempotency_key"))
+    if key is not None and (
+        not isinstance(key, str) or not 0 < len(key) <= MAX_IDEMPOTENCY_KEY
+    ):
+        return jsonify({
+            "error": f"idempotency key must be 1-{MAX_IDEMPOTENCY_KEY} characters"
+        }), 400
+
+    request_hash = _request_hash(data)
+
+    existing = _job_for_key(key)
+    if existing is not None:
+        return _replay_or_conflict(existing, request_hash)
+
+    client_message = data.get("client_message")
+    if client_message is not None and not isinstance(client_message, str):
+        return jsonify({"error": "client_message must be a string"}), 400
+
+    try:
+        profile = rate_profiles.store.for_user(current_user.id, current_user.plan)
+        result = изчисли_за_профил(data, profile)
+        fields, materials = job_import.job_from_quote(result, client_message)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    fields["idempotency_key"] = key
+    fields["idempotency_hash"] = request_hash if key is not None else None
+
+    try:
+        job_id, = job_import.insert_jobs([(current_user.id, fields, materials, None)])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+        # a concurrent retry with the same key committed first
+        existing = _job_for_key(key)
+        if existing is None:
+            raise
+        return _replay_or_conflict(existing, request_hash)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    db_routing.mark_write()
+    after_job_saved(current_user.id, job_id, fields["description"], materials)
+
+    return _saved_quote(job_id, fields, 201)
+
+
+@bp.route("/api/jobs/import", methods=["POST"])
+@login_required
+def import_jobs():
+
+    fmt = request.args.get("format")
+    if fmt is None:
+        fmt = "csv" if request.mimetype == "text/csv" else "ndjson"
+
+    if fmt == "csv":
+        rows = job_import.iter_csv(request.stream)
+    elif fmt == "ndjson":
+        rows = job_import.iter_ndjson(request.stream)
+    else:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    user_id = current_user.id
+
+    def chunk_committed(jobs):
+        try:
+            materials_catalog.record_import(user_id, jobs)
+        except Exception:
+            logger.exception("import for user %s: materials catalog hook failed", user_id)
+
+    try:
+        report = job_import.import_jobs(user_id, rows, on_commit=chunk_committed)
+    except UnicodeDecodeError:
+        db.session.rollback()
+        # chunks before the bad byte are already committed (and recorded)
+        return jsonify({"error": "body must be UTF-8"}), 400
+
+    if report["imported"]:
+        db_routing.mark_write()
+        notify_data_changed(user_id)
+
+    return jsonify(report), 200
+
+
+# =========================
+# API: EXPORT JOBS
+# =========================
+
+@bp.route("/api/jobs/export")
+@login_required
+def export_jobs():
+
+    fmt = request.args.get("format", "ndjson")
+
+    if fmt == "ndjson":
+        lines = job_export.ndjson_lines(current_user.id)
+        mimetype = "application/x-ndjson"
+    elif fmt == "csv":
+        lines = job_export.csv_lines(current_user.id)
+        mimetype = "text/csv"
+    else:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    return Response(
+        stream_with_context(lines),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=jobs.{fmt}"
+        },
+    )
+
+
+# =========================
+# API: ANALYTICS
+# =========================
+
+def analytics_payload(user_id):
+    stats = user_stats.get_stats(user_id)
+
+    total_jobs = stats.total_jobs
+
+    if total_jobs:
+        total_profit = stats.total_profit
+        total_revenue = stats.total_revenue
+        total_materials = stats.total_materials
+    else:
+        # avoid float residue once every job is deleted
+        total_profit = total_revenue = total_materials = 0
+
+    avg_margin = (
+        (total_profit / total_revenue) * 100
+        if total_revenue > 0 else 0
+    )
+
+    if avg_margin < 25:
+        health_status = "low"
+    elif avg_margin < 30:
+        health_status = "warning"
+    else:
+        health_status = "healthy"
+
+    return {
+        "profit": round(total_profit, 2),
+        "revenue": round(total_revenue, 2),
+        "materials": round(total_materials, 2),
+        "jobs": total_jobs,
+        "avg_margin": round(avg_margin, 2),
+        "health": health_status,
+        "totals": {
+            "profit": round(total_profit, 2),
+            "revenue": round(total_revenue, 2),
+            "materials": round(total_materials, 2),
+            "jobs": total_jobs
+        }
+    }
+
+
+@bp.route("/api/analytics")
+@login_required
+@db_routing.replica_reads
+@etag_by_data_version
+def analytics():
+    return jsonify(analytics_payload(current_user.id))
+
+
+@bp.route("/api/analytics/timeseries")
+@login_required
+@db_routing.replica_reads
+@etag_by_data_version
+def analytics_timeseries():
+
+    bucket = request.args.get("bucket", "day")
+    if bucket not in timeseries.BUCKETS:
+        return jsonify({
+            "error": f"bucket must be one of {', '.join(timeseries.BUCKETS)}"
+        }), 400
+
+    try:
+        start = timeseries.parse_date(request.args.get("from"))
+        end = timeseries.parse_date(request.args.get("to"))
+    except ValueError:
+        return jsonify({"error": "from/to must be YYYY-MM-DD"}), 400
+
+    points = timeseries.timeseries(current_user.id, bucket, start, end)
+
+    return jsonify({
+        "bucket": bucket,
+        "from": start.isoformat() if start else None,
+        "to": end.isoformat() if end else None,
+        "points": points
+    })
+
+
+# =========================
+# API: RECENT JOBS
+# =========================
+
+@bp.route("/api/jobs/recent")
+@login_required
+@db_routing.replica_reads
+@etag_by_data_version
+def recent_jobs():
+    return jsonify(recent_payload(current_user.id))
+
+
+def recent_payload(user_id):
+    jobs = (
+        Job.query
+        .filter_by(user_id=user_id)
+        .order_by(Job.created_at.desc())
+        .limit(10)
+        .all()
+    )
+
+    return [job_listing.summary(j) for j in jobs]
+
+
+# =========================
+# API: LIST JOBS (KEYSET)
+# =========================
+
+@bp.route("/api/jobs", methods=["GET"])
+@login_required
+@db_routing.replica_reads
+@etag_by_data_version
+def list_jobs():
+
+    try:
+        limit = min(
+            int(request.args.get("limit", job_listing.DEFAULT_LIMIT)),
+            job_listing.MAX_LIMIT,
+        )
+        if limit < 1:
+            raise ValueError
+
+        start = timeseries.parse_date(request.args.get("from"))
+        end = timeseries.parse_date(request.args.get("to"))
+
+        min_margin = request.args.get("min_margin")
+        if min_margin is not None:
+            min_margin = float(min_margin)
+    except ValueError:
+        return jsonify({"error": "invalid limit, from/to or min_margin"}), 400
+
+    try:
+        jobs, next_cursor = job_listing.page(
+            current_user.id,
+            cursor=request.args.get("cursor"),
+            limit=limit,
+            start=datetime.combine(start, time.min) if start else None,
+            end=datetime.combine(end + timedelta(days=1), time.min) if end else None,
+            min_margin=min_margin,
+            q=request.args.get("q"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "jobs": [
+            {**job_listing.summary(j), "created_at": j.created_at.isoformat()}
+            for j in jobs
+        ],
+        "next_cursor": next_cursor
+    })
+
+
+# =========================
+# API: SIMILAR JOBS
+# =========================
+
+MAX_SIMILAR = 50
+
+
+@bp.route("/api/jobs/similar")
+@login_required
+@db_routing.replica_reads
+def similar_jobs_view():
+    description = request.args.get("description", "")
+    materials = [m for m in request.args.get("materials", "").split(",") if m.strip()]
+
+    try:
+        k = int(request.args.get("k", 10))
+    except ValueError:
+        return jsonify({"error": "k must be an integer"}), 400
+    k = max(1, min(k, MAX_SIMILAR))
+
+    return jsonify({
+        "jobs": similar_jobs.index.search(current_user.id, description, materials, k)
+    })
+
+
+# =========================
+# API: MATERIALS CATALOG
+# =========================
+
+MAX_SUGGESTIONS = 50
+
+
+@bp.route("/api/materials/suggest")
+@login_required
+@db_routing.replica_reads
+def suggest_materials():
+    q = request.args.get("q", "")
+
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = max(1, min(limit, MAX_SUGGESTIONS))
+
+    return jsonify({
+        "query": q,
+        "suggestions": materials_catalog.suggest(current_user.id, q, limit)
+    })
+
+
+# =========================
+# API: DELETE JOB
+# =========================
+
+@bp.route("/api/jobs/<int:job_id>", methods=["DELETE"])
+@login_required
+def delete_job(job_id):
+
+    job = Job.query.filter_by(
+        id=job_id,
+        user_id=current_user.id
+    ).first_or_404()
+
+    lines = db.session.query(
+        JobMaterial.name, JobMaterial.unit_price, JobMaterial.total_price
+    ).filter(JobMaterial.job_id == job.id).all()
+    materials_total = sum(line.total_price for line in lines)
+
+    profit, revenue = job.profit_amount, job.final_price
+
+    JobMaterial.query.filter_by(job_id=job.id).delete()
+    db.session.delete(job)
+    db.session.flush()
+
+    user_stats.apply_delta(
+        current_user.id,
+        jobs=-1,
+        profit=-profit,
+        revenue=-revenue,
+        materials=-materials_total,
+    )
+
+    db.session.commit()
+    db_routing.mark_write()
+    notify_data_changed(current_user.id)
+    try:
+        materials_catalog.remove(
+            current_user.id, [(line.name, line.unit_price) for line in lines]
+        )
+    except Exception:
+        logger.exception("delete of job %s: materials catalog hook failed", job_id)
+    similar_jobs.index.job_deleted(current_user.id, job_id)
+
+    return jsonify({"status": "deleted"})
@@ -1,21 +1,10 @@
+import gc
 import os
-from datetime import datetime
+import weakref
+from functools import partial
 
-from flask import Flask, request, jsonify, redirect, render_template
-from flask_migrate import Migrate
-from sqlalchemy import func
+from flask import Flask
 
-from flask_login import (
-    LoginManager,
-    login_user,
-    login_required,
-    logout_user,
-    current_user,
-)
-
-import bcrypt
-
-from pricing_engine import изчисли_оферта
 from extensions import db
 
 
@@ -25,334 +14,300 @@ from extensions import db
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 INSTANCE_DIR = os.path.join(BASE_DIR, "instance")
-os.makedirs(INSTANCE_DIR, exist_ok=True)
 DB_PATH = os.path.join(INSTANCE_DIR, "local.db")
 
 
 # =========================
-# APP SETUP
+# CONFIG
 # =========================
 
-app = Flask(__name__)
-app.json.ensure_ascii = False
-
-app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-change-this")
-
-# 🔥 PRODUCTION DATABASE SUPPORT (Render PostgreSQL)
-database_url = os.getenv("DATABASE_URL")
-
-if database_url:
-    if database_url.startswith("postgres://"):
-        database_url = database_url.replace("postgres://", "postgresql://", 1)
-    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-else:
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_PATH}"
-
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-db.init_app(app)
-migrate = Migrate(app, db)
+def load_config(app):
+    """Read settings from the environment. No side effects."""
+    import profiling
 
+    app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-change-this")
 
-# IMPORTANT: import models AFTER db.init_app
-import models
-from models import User, Job, JobMaterial
+    # 🔥 PRODUCTION DATABASE SUPPORT (Render PostgreSQL)
+    database_url = os.getenv("DATABASE_URL")
 
+    if database_url:
+        if database_url.startswith("postgres://"):
+            database_url = database_url.replace("postgres://", "postgresql://", 1)
+        app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    else:
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_PATH}"
 
-# =========================
-# LOGIN MANAGER
-# =========================
-
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = "login"
-
-
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-# =========================
-# PAGE ROUTES
-# =========================
+    # optional read replica: read-only views use it unless the user wrote in
+    # the last REPLICA_STICKY_SECONDS; a failing replica is skipped for
+    # REPLICA_RETRY_SECONDS
+    replica_url = os.getenv("DATABASE_REPLICA_URL")
 
-@app.route("/")
-def landing():
-    return render_template("index.html")
+    if replica_url and replica_url.startswith("postgres://"):
+        replica_url = replica_url.replace("postgres://", "postgresql://", 1)
 
+    app.config["DATABASE_REPLICA_URL"] = replica_url
+    app.config["REPLICA_STICKY_SECONDS"] = float(os.getenv("REPLICA_STICKY_SECONDS", 5))
+    app.config["REPLICA_RETRY_SECONDS"] = float(os.getenv("REPLICA_RETRY_SECONDS", 30))
 
-@app.route("/kak-raboti")
-@app.route("/how-it-works")
-def how_it_works():
-    return render_template("how-it-works.html")
+    # quote cache: 0 size disables it, TTL in seconds (0 = no expiry)
+    app.config["QUOTE_CACHE_SIZE"] = int(os.getenv("QUOTE_CACHE_SIZE", 1024))
+    app.config["QUOTE_CACHE_TTL"] = float(os.getenv("QUOTE_CACHE_TTL", 0))
 
+    # per-plan / per-user visit fee, per-km rate and minimum offer (JSON);
+    # edits are picked up within RATE_PROFILES_CHECK_SECONDS
+    app.config["RATE_PROFILES_PATH"] = os.getenv(
+        "RATE_PROFILES_PATH", os.path.join(INSTANCE_DIR, "rate_profiles.json")
+    )
+    app.config["RATE_PROFILES_CHECK_SECONDS"] = float(os.getenv("RATE_PROFILES_CHECK_SECONDS", 5))
 
-@app.route("/dashboard")
-@login_required
-def dashboard():
-    return render_template("dashboard.html")
+    # push channel: "local" (single worker) or "postgres" (LISTEN/NOTIFY)
+    app.config["PUBSUB_BACKEND"] = os.getenv("PUBSUB_BACKEND", "local")
+    app.config["SSE_HEARTBEAT"] = float(os.getenv("SSE_HEARTBEAT", 15))
 
+    # user loader cache: size 0 disables it, TTL bounds cross-worker staleness
+    app.config["USER_CACHE_SIZE"] = int(os.getenv("USER_CACHE_SIZE", 10000))
+    app.config["USER_CACHE_TTL"] = float(os.getenv("USER_CACHE_TTL", 60))
 
-@app.route("/demo")
-@login_required
-def demo():
-    return render_template("demo.html")
+    # materials typeahead: per-worker catalogs, bounded by their total items
+    app.config["MATERIALS_CATALOG_ITEMS"] = int(os.getenv("MATERIALS_CATALOG_ITEMS", 200000))
 
+    # similar-job search index, shared by all workers on this host
+    app.config["SIMILAR_JOBS_PATH"] = os.getenv(
+        "SIMILAR_JOBS_PATH", os.path.join(INSTANCE_DIR, "similar_jobs.db")
+    )
 
-@app.route("/analytics")
-@login_required
-def analytics_page():
-    return render_template("analytics.html")
+    # marketing pages rendered and compressed once per deploy (off in debug);
+    # PAGE_CACHE_WARM renders them at boot so --preload workers share them
+    app.config["PAGE_CACHE_ENABLED"] = os.getenv("PAGE_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+    app.config["PAGE_CACHE_WARM"] = os.getenv("PAGE_CACHE_WARM", "1").lower() in ("1", "true", "yes")
+    app.config["PAGE_CACHE_MAX_AGE"] = int(os.getenv("PAGE_CACHE_MAX_AGE", 86400))
+
+    # password hashing: fixed cost (BCRYPT_ROUNDS) or calibrated to a target
+    # latency (BCRYPT_TARGET_MS); stored hashes are upgraded on login
+    app.config["BCRYPT_ROUNDS"] = os.getenv("BCRYPT_ROUNDS")
+    app.config["BCRYPT_TARGET_MS"] = os.getenv("BCRYPT_TARGET_MS")
+    app.config["BCRYPT_WORKERS"] = int(os.getenv("BCRYPT_WORKERS", 2))
+    app.config["BCRYPT_MAX_PENDING"] = int(os.getenv("BCRYPT_MAX_PENDING", 16))
+
+    # job saves: "direct" (one transaction per request) or "group" (batched
+    # group commit, acked once the shared transaction lands)
+    app.config["JOB_WRITE_MODE"] = os.getenv("JOB_WRITE_MODE", "direct")
+    app.config["GROUP_COMMIT_MAX_LATENCY_MS"] = float(os.getenv("GROUP_COMMIT_MAX_LATENCY_MS", 10))
+    app.config["GROUP_COMMIT_MAX_BATCH"] = int(os.getenv("GROUP_COMMIT_MAX_BATCH", 100))
+    app.config["GROUP_COMMIT_TIMEOUT"] = float(os.getenv("GROUP_COMMIT_TIMEOUT", 10))
+
+    # /metrics (Prometheus text format) and /health/db (pool internals);
+    # METRICS_TOKEN requires a bearer token on both
+    app.config["METRICS_TOKEN"] = os.getenv("METRICS_TOKEN")
+
+    # slow-request log with the SQL each request issued; 0 = off
+    app.config["SLOW_REQUEST_MS"] = float(os.getenv("SLOW_REQUEST_MS", 0))
+    app.config["SLOW_REQUEST_MAX_STATEMENTS"] = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", 50))
+
+    # sampling profiler: PROFILE_ENABLED samples PROFILE_SAMPLE_RATE of
+    # requests (per-route overrides in PROFILE_ROUTE_RATES, e.g.
+    # "/api/analytics=0.2"); a request carrying X-Profile-Token equal to
+    # PROFILE_TOKEN is always profiled
+    app.config["PROFILE_ENABLED"] = os.getenv("PROFILE_ENABLED", "").lower() in ("1", "true", "yes")
+    app.config["PROFILE_SAMPLE_RATE"] = float(os.getenv("PROFILE_SAMPLE_RATE", 0.01))
+    app.config["PROFILE_ROUTE_RATES"] = profiling.parse_route_rates(os.getenv("PROFILE_ROUTE_RATES"))
+    app.config["PROFILE_TOKEN"] = os.getenv("PROFILE_TOKEN")
+    app.config["PROFILE_DIR"] = os.getenv("PROFILE_DIR", os.path.join(INSTANCE_DIR, "profiles"))
+    app.config["PROFILE_MAX_FILES"] = int(os.getenv("PROFILE_MAX_FILES", 200))
+    app.config["PROFILE_MAX_MB"] = float(os.getenv("PROFILE_MAX_MB", 100))
 
 
 # =========================
-# AUTH ROUTES
+# EXTENSIONS
 # =========================
 
-@app.route("/login", methods=["GET", "POST"])
-def login():
-
-    if request.method == "POST":
-
-        email = request.form.get("email")
-        password = request.form.get("password")
-
-        user = User.query.filter_by(email=email).first()
-
-        if not user or not bcrypt.checkpw(
-            password.encode(),
-            user.password_hash.encode()
-        ):
-            return render_template(
-                "login.html",
-                error="Невалиден имейл или парола"
-            )
+def init_extensions(app):
+    import db_profiles
+    import db_routing
+    import group_commit
+    import materials_catalog
+    import pubsub
+    import rate_profiles
+    import similar_jobs
+    import user_cache
+    from api import publish_change
+    from auth import login_manager
+    from passwords import hasher
+    from pricing_engine import quote_cache
+
+    if app.config["SQLALCHEMY_DATABASE_URI"] == f"sqlite:///{DB_PATH}":
+        os.makedirs(INSTANCE_DIR, exist_ok=True)
+
+    quote_cache.configure(
+        maxsize=app.config["QUOTE_CACHE_SIZE"],
+        ttl=app.config["QUOTE_CACHE_TTL"],
+    )
 
-        login_user(user)
-        return redirect("/dashboard")
+    rate_profiles.store.configure(
+        path=app.config["RATE_PROFILES_PATH"],
+        check_interval=app.config["RATE_PROFILES_CHECK_SECONDS"],
+    )
 
-    return render_template("login.html")
+    user_cache.cache.configure(
+        maxsize=app.config["USER_CACHE_SIZE"],
+        ttl=app.config["USER_CACHE_TTL"],
+    )
 
+    materials_catalog.cache.configure(
+        maxsize=app.config["MATERIALS_CATALOG_ITEMS"],
+    )
 
-@app.route("/signup", methods=["GET", "POST"])
-def signup():
+    similar_jobs.index.configure(path=app.config["SIMILAR_JOBS_PATH"])
 
-    if request.method == "POST":
+    hasher.configure(
+        workers=app.config["BCRYPT_WORKERS"],
+        max_pending=app.config["BCRYPT_MAX_PENDING"],
+        rounds=int(app.config["BCRYPT_ROUNDS"]) if app.config["BCRYPT_ROUNDS"] else None,
+        target_ms=float(app.config["BCRYPT_TARGET_MS"]) if app.config["BCRYPT_TARGET_MS"] else None,
+    )
+    if hasher.target_ms:
+        # calibrate at boot (once per deploy under --preload), not on the
+        # first signup or login each worker serves
+        hasher.prepare()
+
+    broker = pubsub.create_broker(
+        app.config["PUBSUB_BACKEND"],
+        app.config["SQLALCHEMY_DATABASE_URI"],
+    )
+    app.extensions["broker"] = broker
+
+    # engine profile: SQLite WAL + pragmas, PostgreSQL pool sizing
+    db_profile_name, db_profile = db_profiles.build(app.config["SQLALCHEMY_DATABASE_URI"])
+    app.config["DB_PROFILE"] = db_profile_name
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = db_profile["engine_options"]
+
+    replica_url = app.config["DATABASE_REPLICA_URL"]
+    if replica_url:
+        replica_profile_name, replica_profile = db_profiles.build(replica_url)
+        app.config["DB_REPLICA_PROFILE"] = replica_profile_name
+        app.config["SQLALCHEMY_BINDS"] = {
+            db_routing.REPLICA: {"url": replica_url, **replica_profile["engine_options"]},
+        }
 
-        email = request.form.get("email")
-        password = request.form.get("password")
+    db.init_app(app)
 
-        if User.query.filter_by(email=email).first():
-            return render_template(
-                "signup.html",
-                error="Този акаунт вече съществува"
+    # engines are built here but nothing connects until the first query
+    with app.app_context():
+        db_profiles.install(db.engine, db_profile)
+        if replica_url:
+            db_profiles.install(
+                db.engines[db_routing.REPLICA], replica_profile, db_routing.REPLICA
             )
 
-        hashed_password = bcrypt.hashpw(
-            password.encode(),
-            bcrypt.gensalt()
-        ).decode()
-
-        new_user = User(
-            email=email,
-            password_hash=hashed_password,
-        )
+    login_manager.init_app(app)
 
-        db.session.add(new_user)
-        db.session.commit()
+    app.extensions["group_commit"] = None
 
-        login_user(new_user)
-        return redirect("/dashboard")
+    if app.config["JOB_WRITE_MODE"] == "group":
+        app.extensions["group_commit"] = group_commit.install(
+            app,
+            max_latency=app.config["GROUP_COMMIT_MAX_LATENCY_MS"] / 1000,
+            max_batch=app.config["GROUP_COMMIT_MAX_BATCH"],
+            on_commit=partial(publish_change, broker),
+        )
 
-    return render_template("signup.html")
 
+def init_migrate(app):
+    """Bind Flask-Migrate. Pulls in Alembic, so only the CLI pays for it."""
+    from flask_migrate import Migrate
 
-@app.route("/logout")
-@login_required
-def logout():
-    logout_user()
-    return redirect("/")
+    return Migrate(app, db)
 
 
 # =========================
-# HEALTH CHECK
+# PRELOAD / FORK SAFETY
 # =========================
 
-@app.route("/health")
-def health():
-    return jsonify({"status": "ok"})
-
-
-# =========================
-# API: CALCULATE OFFER
-# =========================
+# engines of every app built in this process; the at-fork hooks can't be
+# unregistered, so they are registered once and read this set
+_fork_engines = weakref.WeakSet()
+_fork_hooks_registered = False
 
-@app.route("/api/izchisli", methods=["POST"])
-@login_required
-def izchisli():
-    data = request.get_json()
-    try:
-        result = изчисли_оферта(data)
-        return jsonify(result), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
 
+def _dispose_in_child():
+    for engine in list(_fork_engines):
+        engine.dispose(close=False)
 
-# =========================
-# API: SAVE OFFER / JOB
-# =========================
 
-@app.route("/api/jobs", methods=["POST"])
-@login_required
-def save_job():
-    data = request.get_json()
-
-    try:
-        hours = data.get("hours", data.get("часове"))
-        hourly_rate = data.get("hourly_rate", data.get("часова_ставка"))
-        profit_percent = data.get("profit_percent", data.get("процент_печалба"))
-        distance = data.get("distance", data.get("разстояние", 0))
-
-        if hours is None:
-            raise KeyError("hours")
-
-        job = Job(
-            user_id=current_user.id,
-            description=data.get("description", data.get("описание", "")),
-            hours=float(hours),
-            hourly_rate=float(hourly_rate),
-            profit_percent=float(profit_percent),
-            distance=float(distance),
-
-            total_cost=float(data.get("total_cost", data.get("себестойност"))),
-            profit_amount=float(data.get("profit_amount", data.get("печалба"))),
-            final_price=float(data.get("final_price", data.get("препоръчителна_цена"))),
-
-            client_message=data.get("client_message", data.get("съобщение")),
-            engine_version=data.get("engine_version", "v3.0"),
-        )
+def _install_fork_hooks(app):
+    """Make ``gunicorn --preload`` safe and copy-on-write friendly.
 
-        db.session.add(job)
-        db.session.flush()
-
-        for m in data.get("materials", data.get("материали", [])):
-            db.session.add(
-                JobMaterial(
-                    job_id=job.id,
-                    name=m.get("name", m.get("име")),
-                    unit_price=float(m.get("unit_price", m.get("единична_цена"))),
-                    quantity=float(m.get("quantity", m.get("количество"))),
-                    total_price=float(m.get("total_price", m.get("стойност"))),
-                )
-            )
+    Before a fork the parent's objects move to the permanent GC
+    generation, so collections in the workers don't write to (and
+    un-share) the pages they live on. In the child, pooled connections
+    inherited from the parent are dropped without being closed, since
+    the parent still owns those sockets. Worker threads (group commit,
+    bcrypt pool, pub/sub listener) already start lazily per process.
+    """
+    global _fork_hooks_registered
 
-        db.session.commit()
-        return jsonify({"status": "saved", "job_id": job.id}), 201
+    with app.app_context():
+        _fork_engines.update(db.engines.values())
 
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": str(e)}), 400
+    if not _fork_hooks_registered:
+        os.register_at_fork(before=gc.freeze, after_in_child=_dispose_in_child)
+        _fork_hooks_registered = True
 
 
 # =========================
-# API: ANALYTICS
+# FACTORY
 # =========================
 
-@app.route("/api/analytics")
-@login_required
-def analytics():
+def create_app(config=None):
+    import api
+    import auth
+    import cli
+    import instrumentation
+    import page_cache
+    import pages
+    import profiling
+    import stream
 
-    total_profit = db.session.query(
-        func.coalesce(func.sum(Job.profit_amount), 0)
-    ).filter(Job.user_id == current_user.id).scalar()
+    app = Flask(__name__)
+    app.json.ensure_ascii = False
 
-    total_revenue = db.session.query(
-        func.coalesce(func.sum(Job.final_price), 0)
-    ).filter(Job.user_id == current_user.id).scalar()
+    load_config(app)
+    if config:
+        app.config.update(config)
 
-    total_jobs = db.session.query(
-        func.count(Job.id)
-    ).filter(Job.user_id == current_user.id).scalar()
+    init_extensions(app)
 
-    total_materials = db.session.query(
-        func.coalesce(func.sum(JobMaterial.total_price), 0)
-    ).join(Job).filter(Job.user_id == current_user.id).scalar()
+    # `flask db ...` needs Migrate; web workers never do
+    if os.environ.get("FLASK_RUN_FROM_CLI") == "true":
+        init_migrate(app)
 
-    avg_margin = (
-        (total_profit / total_revenue) * 100
-        if total_revenue > 0 else 0
-    )
+    app.register_blueprint(pages.bp)
+    app.register_blueprint(auth.bp)
+    app.register_blueprint(api.bp)
+    app.register_blueprint(stream.bp)
+    cli.register(app)
 
-    if avg_margin < 25:
-        health_status = "low"
-    elif avg_margin < 30:
-        health_status = "warning"
-    else:
-        health_status = "healthy"
-
-    return jsonify({
-        "profit": round(total_profit, 2),
-        "revenue": round(total_revenue, 2),
-        "materials": round(total_materials, 2),
-        "jobs": total_jobs,
-        "avg_margin": round(avg_margin, 2),
-        "health": health_status,
-        "totals": {
-            "profit": round(total_profit, 2),
-            "revenue": round(total_revenue, 2),
-            "materials": round(total_materials, 2),
-            "jobs": total_jobs
-        }
-    })
+    with app.app_context():
+        instrumentation.init_app(app, db.engines.values())
 
+    profiling.init_app(app)
+    page_cache.init_app(app)
 
-# =========================
-# API: RECENT JOBS
-# =========================
-
-@app.route("/api/jobs/recent")
-@login_required
-def recent_jobs():
-    jobs = (
-        Job.query
-        .filter_by(user_id=current_user.id)
-        .order_by(Job.created_at.desc())
-        .limit(10)
-        .all()
-    )
-
-    return jsonify([
-        {
-            "id": j.id,
-            "description": j.description,
-            "final_price": round(j.final_price, 2),
-            "profit": round(j.profit_amount, 2),
-            "margin": round((j.profit_amount / j.final_price) * 100, 2)
-            if j.final_price else 0
-        }
-        for j in jobs
-    ])
-
-
-# =========================
-# API: DELETE JOB
-# =========================
-
-@app.route("/api/jobs/<int:job_id>", methods=["DELETE"])
-@login_required
-def delete_job(job_id):
+    _install_fork_hooks(app)
 
-    job = Job.query.filter_by(
-        id=job_id,
-        user_id=current_user.id
-    ).first_or_404()
+    return app
 
-    JobMaterial.query.filter_by(job_id=job.id).delete()
-    db.session.delete(job)
-    db.session.commit()
 
-    return jsonify({"status": "deleted"})
+def __getattr__(name):
+    # keeps `gunicorn app:app` and `flask --app app` working without
+    # building an app on plain import
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # =========================
@@ -361,4 +316,4 @@ def delete_job(job_id):
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5050))
-    app.run(host="0.0.0.0", port=port)
+    create_app().run(host="0.0.0.0", port=port)
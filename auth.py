@@ -0,0 +1,125 @@
+from flask import Blueprint, redirect, render_template, request
+from flask_login import (
+    LoginManager,
+    login_user,
+    login_required,
+    logout_user,
+    current_user,
+)
+
+import db_routing
+import user_cache
+from extensions import db
+from models import User
+from passwords import hasher, HashingBusy
+
+
+bp = Blueprint("auth", __name__)
+
+
+# =========================
+# LOGIN MANAGER
+# =========================
+
+login_manager = LoginManager()
+login_manager.login_view = "auth.login"
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    return user_cache.load(user_id)
+
+
+# =========================
+# AUTH ROUTES
+# =========================
+
+BUSY_MESSAGE = "Сървърът е натоварен. Опитайте отново след малко."
+
+
+@bp.route("/login", methods=["GET", "POST"])
+def login():
+
+    if request.method == "POST":
+
+        email = request.form.get("email")
+        password = request.form.get("password")
+
+        user = User.query.filter_by(email=email).first()
+
+        try:
+            valid = user is not None and hasher.verify(
+                password,
+                user.password_hash
+            )
+        except HashingBusy:
+            return render_template(
+                "login.html",
+                error=BUSY_MESSAGE
+            ), 503
+
+        if not valid:
+            return render_template(
+                "login.html",
+                error="Невалиден имейл или парола"
+            )
+
+        # cost factor changed since this hash was made: upgrade it now
+        if hasher.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = hasher.hash(password)
+                db.session.commit()
+                hasher.record_rehash()
+            except HashingBusy:
+                pass
+
+        login_user(user)
+        return redirect("/dashboard")
+
+    return render_template("login.html")
+
+
+@bp.route("/signup", methods=["GET", "POST"])
+def signup():
+
+    if request.method == "POST":
+
+        email = request.form.get("email")
+        password = request.form.get("password")
+
+        if User.query.filter_by(email=email).first():
+            return render_template(
+                "signup.html",
+                error="Този акаунт вече съществува"
+            )
+
+        try:
+            hashed_password = hasher.hash(password)
+        except HashingBusy:
+            return render_template(
+                "signup.html",
+                error=BUSY_MESSAGE
+            ), 503
+
+        new_user = User(
+            email=email,
+            password_hash=hashed_password,
+        )
+
+        db.session.add(new_user)
+        db.session.commit()
+        user_cache.invalidate(new_user.id)
+        db_routing.mark_write()
+
+        login_user(new_user)
+        return redirect("/dashboard")
+
+    return render_template("signup.html")
+
+
+@bp.route("/logout")
+@login_required
+def logout():
+    user_cache.invalidate(current_user.id)
+    logout_user()
+    return redirect("/")
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with optional TTL and counters.
+
+    ``maxsize`` of 0 disables caching; ``ttl`` is in seconds, falsy for
+    no expiry. Subclasses can hook ``_before_access`` to drop everything
+    when some outside state changes.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self._data: "OrderedDict" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def configure(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            self.ttl = ttl or None
+            self._data.clear()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def _before_access(self):
+        pass
+
+    def get(self, key):
+        with self._lock:
+            self._before_access()
+
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, stored_at = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Value if present and fresh, without touching order or counters."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            value, stored_at = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                return None
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._before_access()
+
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
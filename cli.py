@@ -0,0 +1,183 @@
+import os
+import subprocess
+import sys
+
+import click
+from flask.cli import with_appcontext
+
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+
+# =========================
+# CLI
+# =========================
+
+@click.command("backfill-user-stats")
+@click.option("--user-id", type=int, default=None, help="Only this user.")
+@with_appcontext
+def backfill_user_stats(user_id):
+    """Rebuild the user_stats rollup from jobs and job_materials."""
+    import user_stats
+    from extensions import db
+
+    count = user_stats.rebuild(user_id)
+    db.session.commit()
+    click.echo(f"Rebuilt {count} user_stats row(s).")
+
+
+@click.command("calibrate-bcrypt")
+@click.option("--target-ms", type=float, default=250, show_default=True)
+def calibrate_bcrypt(target_ms):
+    """Suggest BCRYPT_ROUNDS for a target hash latency on this machine."""
+    import passwords
+
+    rounds = passwords.calibrate(target_ms)
+    click.echo(f"BCRYPT_ROUNDS={rounds}")
+
+
+@click.command("check-query-plans")
+@click.option("--jobs-per-user", type=int, default=250, show_default=True)
+def check_query_plans(jobs_per_user):
+    """EXPLAIN every API route's SQL on a seeded scratch SQLite DB."""
+    # separate process: the app here is already bound to the real DB
+    code = subprocess.call([
+        sys.executable, os.path.join(BASE_DIR, "query_plans.py"),
+        "--jobs-per-user", str(jobs_per_user),
+    ])
+    sys.exit(code)
+
+
+@click.command("check-import-time")
+@click.option("--budget-ms", type=float, default=None,
+              help="Cold-start budget (default: IMPORT_BUDGET_MS or 1500).")
+@click.option("--runs", type=int, default=5, show_default=True,
+              help="Fresh interpreters to take the median of.")
+def check_import_time(budget_ms, runs):
+    """Measure `import app; create_app()` in fresh interpreters."""
+    cmd = [sys.executable, os.path.join(BASE_DIR, "import_budget.py"), "--runs", str(runs)]
+    if budget_ms is not None:
+        cmd += ["--budget-ms", str(budget_ms)]
+    sys.exit(subprocess.call(cmd))
+
+
+@click.command("check-pricing-parity")
+@click.option("--cases", type=int, default=100000, show_default=True)
+@click.option("--seed", type=int, default=1, show_default=True)
+def check_pricing_parity(cases, seed):
+    """Check the integer-cents core against v3.0 on random quotes."""
+    import pricing_parity
+
+    sys.exit(pricing_parity.main(["--cases", str(cases), "--seed", str(seed)]))
+
+
+@click.command("check-materials-latency")
+@click.option("--items", type=int, default=100000, show_default=True)
+@click.option("--budget-ms", type=float, default=5.0, show_default=True)
+def check_materials_latency(items, budget_ms):
+    """Check materials typeahead p99 on a synthetic catalog."""
+    import materials_latency
+
+    sys.exit(materials_latency.main(["--items", str(items), "--budget-ms", str(budget_ms)]))
+
+
+# what `flask check` runs: each check sized to take seconds, not minutes
+CHECKS = (
+    ("query plans", ["query_plans.py", "--jobs-per-user", "50"]),
+    ("pricing parity", ["pricing_parity.py", "--cases", "5000", "--seed", "1"]),
+)
+
+
+@click.command("check")
+def check_all():
+    """Run every check with a small fixed size (the CI entry point)."""
+    failed = []
+    for name, argv in CHECKS:
+        click.echo(f"== {name}")
+        script, *args = argv
+        if subprocess.call([sys.executable, os.path.join(BASE_DIR, script), *args]):
+            failed.append(name)
+
+    if failed:
+        click.echo(f"FAILED: {', '.join(failed)}")
+        sys.exit(1)
+    click.echo("all checks passed")
+
+
+@click.command("reload-rate-profiles")
+@with_appcontext
+def reload_rate_profiles():
+    """Validate and load the rate profile file in this process."""
+    import rate_profiles
+
+    rate_profiles.store.reload()
+    stats = rate_profiles.store.stats()
+    if stats["errors"]:
+        raise click.ClickException(f"{stats['path']} is invalid, see the log")
+    click.echo(f"{stats['plans']} plan and {stats['users']} user profile(s) in {stats['path']}")
+
+
+@click.group("profiles")
+def profiles():
+    """Inspect request profiles written by the sampling profiler."""
+
+
+@profiles.command("list")
+@click.option("--route", default=None, help="Only this URL rule, e.g. /api/jobs.")
+@click.option("--user-id", type=int, default=None)
+@with_appcontext
+def profiles_list(route, user_id):
+    """List stored profiles, oldest first."""
+    import profiling
+    from flask import current_app
+
+    directory = current_app.config["PROFILE_DIR"]
+    sizes = {name: size for name, size, _ in profiling.list_profiles(directory)}
+    names = profiling.matching(directory, route, user_id)
+
+    for name in names:
+        click.echo(f"{sizes.get(name, 0) / 1024:8.1f} KiB  {name}")
+    click.echo(f"{len(names)} profile(s) in {directory}")
+
+
+@profiles.command("top")
+@click.argument("names", nargs=-1)
+@click.option("--route", default=None, help="Merge every profile of this URL rule.")
+@click.option("--user-id", type=int, default=None)
+@click.option("--last", type=int, default=1, show_default=True,
+              help="Without NAMES: merge the newest N matching profiles.")
+@click.option("--sort", default="cumulative", show_default=True,
+              type=click.Choice(["cumulative", "tottime", "calls", "ncalls"]))
+@click.option("--limit", type=int, default=20, show_default=True)
+@with_appcontext
+def profiles_top(names, route, user_id, last, sort, limit):
+    """Summarize the top functions of one or more profiles."""
+    import profiling
+    from flask import current_app
+
+    directory = current_app.config["PROFILE_DIR"]
+    if not names:
+        names = profiling.matching(directory, route, user_id)[-last:]
+    if not names:
+        raise click.ClickException("no matching profiles")
+
+    paths = [os.path.join(directory, os.path.basename(n)) for n in names]
+    click.echo(profiling.summarize(paths, sort=sort, limit=limit))
+
+
+COMMANDS = (
+    backfill_user_stats,
+    calibrate_bcrypt,
+    check_all,
+    check_query_plans,
+    check_import_time,
+    check_pricing_parity,
+    check_materials_latency,
+    reload_rate_profiles,
+    profiles,
+)
+
+
+def register(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
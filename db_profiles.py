@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+# =========================
+# POOL METRICS
+# =========================
+
+class PoolStats:
+    """Checkout / wait counters of one engine's pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_total, 6),
+                "wait_seconds_max": round(self.wait_max, 6),
+            }
+
+
+# engine name ("primary", "replica") -> PoolStats, filled by install()
+pool_stats = {}
+
+
+def pool_snapshot():
+    """{(engine, counter): value} for the labelled ``db_pool`` gauge."""
+    return {
+        (engine, key): value
+        for engine, stats in pool_stats.items()
+        for key, value in stats.snapshot().items()
+    }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    # set by install(); engine.dispose() builds a new pool via recreate()
+    stats = None
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        if self.stats is None:
+            return super()._do_get()
+
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return conn
+
+
+def _env(name, default, cast=int):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, "") else default
+
+
+# =========================
+# PROFILES
+# =========================
+
+def _sqlite_profile():
+    return {
+        "engine_options": {
+            "poolclass": InstrumentedQueuePool,
+            "pool_size": _env("DB_POOL_SIZE", 5),
+            "max_overflow": _env("DB_MAX_OVERFLOW", 10),
+            "pool_timeout": _env("DB_POOL_TIMEOUT", 10, float),
+            "connect_args": {"check_same_thread": False},
+        },
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": _env("SQLITE_BUSY_TIMEOUT_MS", 5000),
+            "mmap_size": _env("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+            # negative = KiB rather than pages
+            "cache_size": -_env("SQLITE_CACHE_KB", 64 * 1024),
+            "temp_store": "MEMORY",
+        },
+    }
+
+
+def _postgres_profile():
+    return {
+        "engine_options": {
+            "poolclass": InstrumentedQueuePool,
+            "pool_size": _env("DB_POOL_SIZE", 5),
+            "max_overflow": _env("DB_MAX_OVERFLOW", 10),
+            "pool_timeout": _env("DB_POOL_TIMEOUT", 10, float),
+            "pool_recycle": _env("DB_POOL_RECYCLE", 1800),
+            "pool_pre_ping": True,
+        },
+        "pragmas": {},
+    }
+
+
+def _default_profile():
+    return {"engine_options": {}, "pragmas": {}}
+
+
+PROFILES = {
+    "sqlite": _sqlite_profile,
+    "postgres": _postgres_profile,
+    "default": _default_profile,
+}
+
+
+def profile_name(database_uri):
+    """DB_PROFILE if set, else picked from the URI's dialect."""
+    name = os.getenv("DB_PROFILE")
+    if name:
+        if name not in PROFILES:
+            raise ValueError(f"unknown DB_PROFILE: {name}")
+        return name
+
+    if database_uri.startswith("sqlite:"):
+        # in-memory databases need their single-connection pool
+        if database_uri in ("sqlite://", "sqlite:///:memory:"):
+            return "default"
+        return "sqlite"
+    if database_uri.startswith("postgresql"):
+        return "postgres"
+    return "default"
+
+
+def build(database_uri):
+    name = profile_name(database_uri)
+    return name, PROFILES[name]()
+
+
+def install(engine, profile, name="primary"):
+    """Attach pragma and pool-metric listeners to ``engine``."""
+    pragmas = profile["pragmas"]
+
+    stats = pool_stats[name] = PoolStats()
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.stats = stats
+
+    if pragmas:
+        @event.listens_for(engine, "connect")
+        def _set_pragmas(dbapi_conn, record):
+            cursor = dbapi_conn.cursor()
+            for key, value in pragmas.items():
+                cursor.execute(f"PRAGMA {key}={value}")
+            cursor.close()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        stats.incr("connects")
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        stats.incr("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, record):
+        stats.incr("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_conn, record, exception):
+        stats.incr("invalidations")
+
+
+def describe(engine, profile, name="primary"):
+    pool = engine.pool
+    info = {"profile": profile, "pool": type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        info.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "idle": pool.checkedin(),
+        })
+
+    if name in pool_stats:
+        info.update(pool_stats[name].snapshot())
+    return info
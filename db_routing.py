@@ -0,0 +1,110 @@
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import DBAPIError
+
+
+REPLICA = "replica"
+STICKY_KEY = "db_sticky_until"
+
+
+# =========================
+# REPLICA HEALTH
+# =========================
+
+_down_until = 0.0
+_down_lock = threading.Lock()
+
+
+def mark_replica_down():
+    global _down_until
+    with _down_lock:
+        _down_until = time.monotonic() + current_app.config["REPLICA_RETRY_SECONDS"]
+
+
+def replica_engine():
+    if time.monotonic() < _down_until:
+        return None
+    return current_app.extensions["sqlalchemy"].engines.get(REPLICA)
+
+
+# =========================
+# READ-YOUR-WRITES
+# =========================
+
+def mark_write():
+    """Pin this browser session's reads to the primary for a while."""
+    window = current_app.config["REPLICA_STICKY_SECONDS"]
+    session[STICKY_KEY] = time.time() + window
+
+
+def is_sticky():
+    return has_request_context() and session.get(STICKY_KEY, 0) > time.time()
+
+
+# =========================
+# ROUTING
+# =========================
+
+class RoutingSession(Session):
+    """Sends reads to the replica while a ``replica_reads`` view runs.
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary,
+    as does everything outside such a view (background threads, CLI).
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and not (clause is not None and getattr(clause, "is_dml", False))
+            and has_app_context()
+            and g.get("db_route") == REPLICA
+        ):
+            engine = replica_engine()
+            if engine is not None:
+                return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_reads(view):
+    """Run a read-only view against the replica when it is safe to.
+
+    Skipped when no replica is configured, when the user wrote within the
+    sticky window, or while the replica is marked down. A database error
+    on the replica marks it down and re-runs the view on the primary.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if replica_engine() is None or is_sticky():
+            return view(*args, **kwargs)
+
+        g.db_route = REPLICA
+        try:
+            return view(*args, **kwargs)
+        except DBAPIError:
+            db = current_app.extensions["sqlalchemy"]
+            db.session.rollback()
+            mark_replica_down()
+            current_app.logger.warning("replica failed, using primary", exc_info=True)
+            g.db_route = None
+            return view(*args, **kwargs)
+        finally:
+            g.db_route = None
+
+    return wrapper
+
+
+class use_primary:
+    """Force the primary inside a ``replica_reads`` view (e.g. lazy writes)."""
+
+    def __enter__(self):
+        self._saved = g.get("db_route")
+        g.db_route = None
+
+    def __exit__(self, *exc):
+        g.db_route = self._saved
@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from db_routing import RoutingSession
 
+db = SQLAlchemy(session_options={"class_": RoutingSession})
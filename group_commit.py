@@ -0,0 +1,188 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import job_import
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitter:
+    """Batches job saves from many requests into one transaction.
+
+    ``submit`` hands a parsed job to a background writer and returns a
+    Future. The writer waits up to ``max_latency`` seconds (or until
+    ``max_batch`` jobs are queued), writes the whole group with
+    ``job_import.insert_jobs`` and commits once, then resolves every
+    Future with its job id. A request only answers after that commit, so
+    the database stays the durable store: an un-acknowledged save is
+    simply retried by the client. The queue itself is deliberately in
+    memory rather than a durable local queue; a crash loses only saves
+    that were never acknowledged.
+
+    If the group transaction fails, its jobs are retried one by one so a
+    single bad row only fails its own request.
+    """
+
+    def __init__(self, app, max_latency=0.01, max_batch=100, on_commit=None):
+        self.app = app
+        self.max_latency = max_latency
+        self.max_batch = max_batch
+        self.on_commit = on_commit
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+        self.groups = 0
+        self.jobs = 0
+        self.fallbacks = 0
+
+    # -----------------------
+    # PRODUCER SIDE
+    # -----------------------
+
+    def submit(self, user_id, fields, materials):
+        if self._stopping:
+            raise RuntimeError("group committer is shutting down")
+
+        self._ensure_thread()
+
+        future = Future()
+        self._queue.put((user_id, fields, materials, future))
+        return future
+
+    def _ensure_thread(self):
+        # started lazily so a preloaded app never forks a live thread;
+        # restarted if it died, since queued saves would wait forever
+        with self._lock:
+            if (self._thread is None or self._pid != os.getpid()
+                    or not self._thread.is_alive()):
+                self._thread = threading.Thread(
+                    target=self._run, name="group-commit", daemon=True
+                )
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def stop(self, timeout=5):
+        """Flush everything queued, then stop the writer."""
+        self._stopping = True
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    # -----------------------
+    # WRITER SIDE
+    # -----------------------
+
+    def _collect(self, first):
+        group = [first]
+        deadline = time.monotonic() + self.max_latency
+
+        while len(group) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            group.append(item)
+
+        return group
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                # drain whatever raced in behind the stop marker
+                rest = []
+                while not self._queue.empty():
+                    extra = self._queue.get_nowait()
+                    if extra is not None:
+                        rest.append(extra)
+                if rest:
+                    self._write(rest)
+                return
+
+            self._write(self._collect(item))
+
+    def _write(self, group):
+        futures = [item[3] for item in group]
+        items = [(u, f, m, None) for u, f, m, _ in group]
+
+        with self.app.app_context():
+            try:
+                ids = job_import.insert_jobs(items)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.fallbacks += 1
+                logger.exception("group commit failed, retrying one by one")
+                self._write_each(items, futures)
+                return
+            finally:
+                db.session.remove()
+
+        self.groups += 1
+        self.jobs += len(ids)
+
+        for future, job_id in zip(futures, ids):
+            future.set_result(job_id)
+
+        self._committed({u for u, *_ in items})
+
+    def _write_each(self, items, futures):
+        committed = set()
+
+        for item, future in zip(items, futures):
+            try:
+                job_id = job_import.insert_jobs([item])[0]
+                db.session.commit()
+                future.set_result(job_id)
+                committed.add(item[0])
+                # each retry is its own commit: a group of one
+                self.groups += 1
+                self.jobs += 1
+            except Exception as e:
+                db.session.rollback()
+                future.set_exception(e)
+
+        self._committed(committed)
+
+    def _committed(self, user_ids):
+        if self.on_commit is None:
+            return
+        for user_id in user_ids:
+            try:
+                self.on_commit(user_id)
+            except Exception:
+                logger.exception("group commit: on_commit hook failed")
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize(),
+            "groups": self.groups,
+            "jobs": self.jobs,
+            "avg_group_size": round(self.jobs / self.groups, 2) if self.groups else 0,
+            "fallbacks": self.fallbacks,
+            "max_latency_ms": self.max_latency * 1000,
+            "max_batch": self.max_batch,
+        }
+
+
+def install(app, **kwargs):
+    committer = GroupCommitter(app, **kwargs)
+    atexit.register(committer.stop)
+    return committer
@@ -0,0 +1,105 @@
+"""Cold-start import budget check.
+
+Runs ``import app; app.create_app()`` in a few fresh interpreters under
+``python -X importtime`` and fails if the median start-up exceeds the
+budget or pulls in a module that only the CLI / batch paths need.
+
+    python import_budget.py [--budget-ms 1500] [--runs 5]   # or: flask check-import-time
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+
+# about twice a typical start-up, so a noisy runner doesn't fail it
+DEFAULT_BUDGET_MS = 1500
+DEFAULT_RUNS = 5
+
+# loaded on demand by migrations, bcrypt hashing and batch pricing
+FORBIDDEN = ("alembic", "flask_migrate", "bcrypt", "numpy")
+
+CHILD = (
+    "import time, sys; t = time.perf_counter(); "
+    "import app; app.create_app(); "
+    "print(f'create_app_ms {(time.perf_counter() - t) * 1000:.1f}', file=sys.stderr)"
+)
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def measure():
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    # a scratch DB keeps the check off the real instance dir
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env.pop("FLASK_RUN_FROM_CLI", None)
+    # opting into bcrypt calibration moves its import and cost to boot
+    env.pop("BCRYPT_TARGET_MS", None)
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=here, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(proc.returncode)
+
+    modules = {}
+    total_ms = None
+
+    for line in proc.stderr.splitlines():
+        if line.startswith("create_app_ms "):
+            total_ms = float(line.split()[1])
+            continue
+        m = LINE.match(line)
+        if m:
+            self_us, cumulative_us, indent, name = m.groups()
+            modules[name] = (int(self_us), int(cumulative_us), len(indent) == 0)
+
+    return total_ms, modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--budget-ms", type=float,
+        default=float(os.getenv("IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS)),
+    )
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    args = parser.parse_args(argv)
+
+    runs = sorted((measure() for _ in range(max(args.runs, 1))), key=lambda run: run[0])
+    total_ms = statistics.median(ms for ms, _ in runs)
+    modules = runs[len(runs) // 2][1]
+
+    heaviest = sorted(
+        ((cum, name) for name, (_, cum, top) in modules.items() if top),
+        reverse=True,
+    )[:10]
+
+    print(f"import app + create_app(): {total_ms:.1f} ms median of {len(runs)} "
+          f"(budget {args.budget_ms:.0f} ms)")
+    print("heaviest top-level imports:")
+    for cumulative_us, name in heaviest:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failures = []
+
+    if total_ms > args.budget_ms:
+        failures.append(f"start-up took {total_ms:.1f} ms")
+
+    for name in FORBIDDEN:
+        if any(name in run_modules for _, run_modules in runs):
+            failures.append(f"{name} is imported at start-up")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import hmac
+import logging
+import time
+
+from flask import Blueprint, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+import metrics
+
+
+logger = logging.getLogger("slow_requests")
+
+bp = Blueprint("metrics", __name__)
+
+
+# =========================
+# METRICS
+# =========================
+# Values are per worker process: each gunicorn worker answers /metrics
+# with its own counters, so scrape every worker or sum over instances.
+
+request_seconds = metrics.histogram(
+    "http_request_duration_seconds",
+    "Request latency by route (time to first byte for streams).",
+    labels=("method", "route"),
+)
+
+requests_total = metrics.counter(
+    "http_requests_total",
+    "Requests by route and status code.",
+    labels=("method", "route", "status"),
+)
+
+sql_statements = metrics.histogram(
+    "http_request_sql_statements",
+    "SQL statements issued per request.",
+    labels=("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+
+sql_seconds = metrics.histogram(
+    "http_request_sql_duration_seconds",
+    "Total SQL time per request.",
+    labels=("route",),
+)
+
+
+# =========================
+# SQL COUNTERS (ENGINE EVENTS)
+# =========================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("query_start", time.perf_counter())
+
+    # background threads (group commit, CLI) have no request to charge
+    if not has_request_context():
+        return
+    sql = g.get("sql")
+    if sql is None:
+        return
+
+    sql["count"] += 1
+    sql["seconds"] += elapsed
+    if sql["statements"] is not None and len(sql["statements"]) < sql["max"]:
+        sql["statements"].append((elapsed, statement))
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# =========================
+# REQUEST HOOKS
+# =========================
+
+def _route():
+    # the URL rule, not the path, so ids don't explode label cardinality
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+
+def _start_request():
+    slow_ms = current_app.config["SLOW_REQUEST_MS"]
+
+    g.request_start = time.perf_counter()
+    g.sql = {
+        "count": 0,
+        "seconds": 0.0,
+        # statements are only kept when the slow log is on
+        "statements": [] if slow_ms > 0 else None,
+        "max": current_app.config["SLOW_REQUEST_MAX_STATEMENTS"],
+    }
+
+
+def _finish_request(response):
+    start = g.pop("request_start", None)
+    sql = g.pop("sql", None)
+    if start is None or sql is None:
+        return response
+
+    elapsed = time.perf_counter() - start
+    route = _route()
+
+    request_seconds.observe(elapsed, request.method, route)
+    requests_total.inc(request.method, route, str(response.status_code))
+    sql_statements.observe(sql["count"], route)
+    sql_seconds.observe(sql["seconds"], route)
+
+    slow_ms = current_app.config["SLOW_REQUEST_MS"]
+    if slow_ms > 0 and elapsed * 1000 >= slow_ms:
+        _log_slow(route, response.status_code, elapsed, sql)
+
+    return response
+
+
+def _log_slow(route, status, elapsed, sql):
+    lines = [
+        f"slow request {request.method} {request.path} ({route}) -> {status}: "
+        f"{elapsed * 1000:.1f} ms, {sql['count']} SQL statements in "
+        f"{sql['seconds'] * 1000:.1f} ms"
+    ]
+    for seconds, statement in sql["statements"]:
+        lines.append(f"  {seconds * 1000:8.2f} ms  {' '.join(statement.split())[:500]}")
+    if sql["count"] > len(sql["statements"]):
+        lines.append(f"  ... {sql['count'] - len(sql['statements'])} more")
+
+    logger.warning("\n".join(lines))
+
+
+# =========================
+# /metrics
+# =========================
+
+def authorized():
+    """True unless METRICS_TOKEN is set and the bearer token differs."""
+    token = current_app.config["METRICS_TOKEN"]
+    if not token:
+        return True
+    supplied = request.headers.get("Authorization", "")
+    return hmac.compare_digest(supplied, f"Bearer {token}")
+
+
+def unauthorized():
+    return Response("unauthorized\n", status=401, mimetype="text/plain")
+
+
+@bp.route("/metrics")
+def prometheus_metrics():
+    if not authorized():
+        return unauthorized()
+
+    return Response(
+        metrics.REGISTRY.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def _register_gauges(app):
+    import db_profiles
+    import materials_catalog
+    import user_cache
+    from passwords import hasher
+    from pricing_engine import quote_cache
+
+    def group_commit_stats():
+        committer = app.extensions.get("group_commit")
+        return committer.stats() if committer is not None else {}
+
+    metrics.gauge_callback(
+        "db_pool", "Connection pool counters per engine.", ("engine", "stat"),
+        db_profiles.pool_snapshot,
+    )
+    metrics.gauge_callback(
+        "quote_cache", "Quote cache counters.", "stat", quote_cache.stats,
+    )
+    metrics.gauge_callback(
+        "user_cache", "Login user cache counters.", "stat", user_cache.cache.stats,
+    )
+    metrics.gauge_callback(
+        "materials_catalog", "Materials typeahead catalog cache counters.", "stat",
+        materials_catalog.stats,
+    )
+    metrics.gauge_callback(
+        "password_hashing", "bcrypt pool counters.", "stat",
+        # not hasher.stats(): reading .rounds may trigger calibration
+        lambda: {
+            "completed": hasher.completed,
+            "rejected": hasher.rejected,
+            "rehashed": hasher.rehashed,
+        },
+    )
+    metrics.gauge_callback(
+        "group_commit", "Group-commit writer counters.", "stat", group_commit_stats,
+    )
+
+
+def init_app(app, engines):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+    for engine in engines:
+        instrument_engine(engine)
+
+    _register_gauges(app)
+    app.register_blueprint(bp)
@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from extensions import db
+from models import Job
+
+
+BATCH_SIZE = 1000
+
+# same keys job_import accepts, so an export can be re-imported as is
+FIELDS = (
+    "id",
+    "created_at",
+    "description",
+    "hours",
+    "hourly_rate",
+    "profit_percent",
+    "distance",
+    "total_cost",
+    "profit_amount",
+    "final_price",
+    "client_message",
+    "engine_version",
+    "materials",
+)
+
+
+def _job_dict(job):
+    return {
+        "id": job.id,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "description": job.description,
+        "hours": job.hours,
+        "hourly_rate": job.hourly_rate,
+        "profit_percent": job.profit_percent,
+        "distance": job.distance,
+        "total_cost": job.total_cost,
+        "profit_amount": job.profit_amount,
+        "final_price": job.final_price,
+        "client_message": job.client_message,
+        "engine_version": job.engine_version,
+        "materials": [
+            {
+                "name": m.name,
+                "unit_price": m.unit_price,
+                "quantity": m.quantity,
+                "total_price": m.total_price,
+            }
+            for m in job.materials
+        ],
+    }
+
+
+def iter_jobs(user_id, batch_size=BATCH_SIZE):
+    """Yield lists of job dicts, ``batch_size`` jobs at a time.
+
+    ``yield_per`` streams rows from a server-side cursor where the driver
+    supports one, and ``selectinload`` fetches materials with one IN query
+    per batch instead of one query per job.
+    """
+    stmt = (
+        select(Job)
+        .where(Job.user_id == user_id)
+        .order_by(Job.created_at, Job.id)
+        .options(selectinload(Job.materials))
+        .execution_options(yield_per=batch_size)
+    )
+
+    for partition in db.session.scalars(stmt).partitions():
+        yield [_job_dict(job) for job in partition]
+        # drop the batch (materials cascade) so the session stays small
+        for job in partition:
+            db.session.expunge(job)
+
+
+def ndjson_lines(user_id):
+    for batch in iter_jobs(user_id):
+        yield "".join(
+            json.dumps(job, ensure_ascii=False) + "\n" for job in batch
+        )
+
+
+def csv_lines(user_id):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=FIELDS)
+
+    writer.writeheader()
+    yield buf.getvalue()
+
+    for batch in iter_jobs(user_id):
+        buf.seek(0)
+        buf.truncate()
+        for job in batch:
+            writer.writerow({
+                **job,
+                "materials": json.dumps(job["materials"], ensure_ascii=False),
+            })
+        yield buf.getvalue()
@@ -0,0 +1,295 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import insert
+
+import user_stats
+from extensions import db
+from models import Job, JobMaterial
+
+
+CHUNK_SIZE = 500
+MAX_ERRORS = 1000
+
+# job_materials.name is a VARCHAR(255), jobs.engine_version a VARCHAR(20)
+MAX_MATERIAL_NAME = 255
+MAX_ENGINE_VERSION = 20
+
+
+# =========================
+# ROW PARSING
+# =========================
+
+def check_text(job, materials):
+    """Raise ValueError on text the jobs tables would reject.
+
+    Runs before the INSERT so one bad row fails on its own instead of
+    taking its whole import chunk down with it.
+    """
+    for key in ("description", "client_message"):
+        if not isinstance(job[key], str):
+            raise ValueError(f"{key} must be a string")
+
+    version = job["engine_version"]
+    if version is not None and (
+        not isinstance(version, str) or len(version) > MAX_ENGINE_VERSION
+    ):
+        raise ValueError(f"engine_version must be a string of at most {MAX_ENGINE_VERSION} characters")
+
+    for m in materials:
+        if not isinstance(m["name"], str) or not m["name"].strip():
+            raise ValueError("material name must be a non-empty string")
+        if len(m["name"]) > MAX_MATERIAL_NAME:
+            raise ValueError(f"material name is longer than {MAX_MATERIAL_NAME} characters")
+
+
+def parse_job(data):
+    """Turn a bilingual job payload into (job fields, material fields).
+
+    Accepts the English keys and the Bulgarian ones the demo page used to
+    send. Raises KeyError / ValueError / TypeError on bad input.
+    """
+    hours = data.get("hours", data.get("часове"))
+    hourly_rate = data.get("hourly_rate", data.get("часова_ставка"))
+    profit_percent = data.get("profit_percent", data.get("процент_печалба"))
+    distance = data.get("distance", data.get("разстояние", 0))
+
+    if hours is None:
+        raise KeyError("hours")
+
+    client_message = data.get("client_message", data.get("съобщение"))
+    if client_message is None:
+        raise KeyError("client_message")
+
+    job = dict(
+        description=data.get("description", data.get("описание", "")),
+        hours=float(hours),
+        hourly_rate=float(hourly_rate),
+        profit_percent=float(profit_percent),
+        distance=float(distance),
+
+        total_cost=float(data.get("total_cost", data.get("себестойност"))),
+        profit_amount=float(data.get("profit_amount", data.get("печалба"))),
+        final_price=float(data.get("final_price", data.get("препоръчителна_цена"))),
+
+        client_message=client_message,
+        engine_version=data.get("engine_version", "v3.0"),
+    )
+
+    materials = [
+        dict(
+            name=m.get("name", m.get("име")),
+            unit_price=float(m.get("unit_price", m.get("единична_цена"))),
+            quantity=float(m.get("quantity", m.get("количество"))),
+            total_price=float(m.get("total_price", m.get("стойност"))),
+        )
+        for m in data.get("materials", data.get("материали", []))
+    ]
+
+    for m in materials:
+        if m["name"] is None:
+            raise KeyError("name")
+
+    check_text(job, materials)
+    return job, materials
+
+
+def job_from_quote(result, client_message=None):
+    """(job fields, material fields) from a full quote result.
+
+    Everything is taken from the server-side calculation; only the client
+    message may be replaced by the (edited) text the user is sending.
+    Raises ValueError on text the jobs tables would reject.
+    """
+    job = dict(
+        description=result["description"],
+        hours=result["hours"],
+        hourly_rate=result["hourly_rate"],
+        profit_percent=result["profit_percent"],
+        distance=result["distance"],
+
+        total_cost=result["costs"]["base_cost"],
+        profit_amount=result["income"]["total_profit"],
+        final_price=result["final_price"],
+
+        client_message=client_message if client_message is not None else result["client_message"],
+        engine_version=result["engine_version"],
+    )
+
+    materials = [
+        dict(
+            name=m["name"],
+            unit_price=m["unit_price"],
+            quantity=m["quantity"],
+            total_price=m["total_price"],
+        )
+        for m in result["materials"]
+    ]
+
+    check_text(job, materials)
+
+    return job, materials
+
+
+# =========================
+# STREAM READERS
+# =========================
+
+def _text(stream):
+    return io.TextIOWrapper(io.BufferedReader(stream), encoding="utf-8")
+
+
+def iter_ndjson(stream):
+    """Yield (row number, dict or exception) for each non-blank line."""
+    for n, line in enumerate(_text(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield n, json.loads(line)
+        except ValueError as e:
+            yield n, e
+
+
+def iter_csv(stream):
+    """Yield (row number, dict or exception) for each CSV record.
+
+    ``materials`` may hold a JSON array; empty cells count as missing.
+    """
+    reader = csv.DictReader(_text(stream))
+
+    for n, record in enumerate(reader, start=1):
+        row = {k: v for k, v in record.items() if k and v not in ("", None)}
+        try:
+            if "materials" in row:
+                row["materials"] = json.loads(row["materials"])
+            yield n, row
+        except ValueError as e:
+            yield n, e
+
+
+# =========================
+# CHUNKED INSERTS
+# =========================
+
+def insert_jobs(items):
+    """Insert jobs for any mix of users with two executemany statements.
+
+    ``items`` are (user_id, job fields, material fields, created_at or
+    None). Each user's rollup gets one delta. Returns the new job ids in
+    item order; the caller commits.
+    """
+    now = datetime.utcnow()
+
+    job_rows = [
+        {**job, "user_id": user_id, "created_at": created_at or now}
+        for user_id, job, _, created_at in items
+    ]
+
+    ids = db.session.execute(
+        insert(Job).returning(Job.id, sort_by_parameter_order=True),
+        job_rows,
+    ).scalars().all()
+
+    material_rows = [
+        {**m, "job_id": job_id, "created_at": now}
+        for job_id, (_, _, materials, _) in zip(ids, items)
+        for m in materials
+    ]
+
+    if material_rows:
+        db.session.execute(insert(JobMaterial), material_rows)
+
+    deltas = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    for (user_id, job, materials, _) in items:
+        d = deltas[user_id]
+        d[0] += 1
+        d[1] += job["profit_amount"]
+        d[2] += job["final_price"]
+        d[3] += sum(m["total_price"] for m in materials)
+
+    for user_id, (jobs, profit, revenue, materials) in deltas.items():
+        user_stats.apply_delta(
+            user_id,
+            jobs=jobs,
+            profit=profit,
+            revenue=revenue,
+            materials=materials,
+        )
+
+    return ids
+
+
+def import_jobs(user_id, rows, chunk_size=CHUNK_SIZE, on_commit=None):
+    """Validate and insert ``rows`` in committed chunks.
+
+    ``rows`` is an iterator of (row number, dict or exception) as produced
+    by the readers above. Only one chunk is held in memory at a time.
+    ``on_commit`` is called after every commit with the (materials,
+    created_at) of the jobs it wrote.
+    """
+    report = {"imported": 0, "failed": 0, "errors": []}
+
+    def fail(n, error):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_ERRORS:
+            report["errors"].append({"row": n, "error": error})
+
+    rows = iter(rows)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        parsed = []
+        for n, data in chunk:
+            if isinstance(data, Exception):
+                fail(n, f"invalid row: {data}")
+                continue
+            try:
+                if not isinstance(data, dict):
+                    raise TypeError("expected an object")
+                job, materials = parse_job(data)
+                created_at = data.get("created_at")
+                if created_at is not None:
+                    created_at = datetime.fromisoformat(created_at)
+                parsed.append((n, job, materials, created_at))
+            except KeyError as e:
+                fail(n, f"missing field: {e.args[0]}")
+            except (AttributeError, TypeError, ValueError) as e:
+                fail(n, str(e))
+
+        if not parsed:
+            continue
+
+        try:
+            insert_jobs([
+                (user_id, job, materials, created_at)
+                for _, job, materials, created_at in parsed
+            ])
+            db.session.commit()
+            report["imported"] += len(parsed)
+            if on_commit is not None:
+                on_commit([(materials, created_at) for _, _, materials, created_at in parsed])
+        except Exception:
+            db.session.rollback()
+            # something the row checks can't see: retry one by one so only
+            # the offending rows are rejected
+            for n, job, materials, created_at in parsed:
+                try:
+                    insert_jobs([(user_id, job, materials, created_at)])
+                    db.session.commit()
+                    report["imported"] += 1
+                except Exception as e:
+                    db.session.rollback()
+                    fail(n, f"row rejected: {e.__class__.__name__}")
+                    continue
+                if on_commit is not None:
+                    on_commit([(materials, created_at)])
+
+    report["errors_truncated"] = report["failed"] > len(report["errors"])
+    return report
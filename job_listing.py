@@ -0,0 +1,89 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select
+
+from extensions import db
+from models import Job
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+# =========================
+# CURSORS
+# =========================
+
+def encode_cursor(job):
+    raw = json.dumps([job.created_at.isoformat(), job.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id); raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, job_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(job_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+# =========================
+# QUERY
+# =========================
+
+def summary(job):
+    return {
+        "id": job.id,
+        "description": job.description,
+        "final_price": round(job.final_price, 2),
+        "profit": round(job.profit_amount, 2),
+        "margin": round((job.profit_amount / job.final_price) * 100, 2)
+        if job.final_price else 0
+    }
+
+
+def page(user_id, cursor=None, limit=DEFAULT_LIMIT, start=None, end=None,
+         min_margin=None, q=None):
+    """One page of jobs, newest first, keyed on (created_at, id).
+
+    The cursor turns into a range predicate on the (user_id, created_at)
+    index, so every page is an index seek no matter how deep it is.
+    Returns (jobs, next_cursor).
+    """
+    stmt = select(Job).where(Job.user_id == user_id)
+
+    if cursor:
+        created_at, job_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            Job.created_at < created_at,
+            and_(Job.created_at == created_at, Job.id < job_id),
+        ))
+
+    if start is not None:
+        stmt = stmt.where(Job.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(Job.created_at < end)
+
+    if min_margin is not None:
+        stmt = stmt.where(
+            Job.final_price > 0,
+            Job.profit_amount >= Job.final_price * (min_margin / 100),
+        )
+
+    if q:
+        stmt = stmt.where(Job.description.icontains(q, autoescape=True))
+
+    stmt = stmt.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit + 1)
+
+    jobs = db.session.scalars(stmt).all()
+
+    next_cursor = None
+    if len(jobs) > limit:
+        jobs = jobs[:limit]
+        next_cursor = encode_cursor(jobs[-1])
+
+    return jobs, next_cursor
@@ -0,0 +1,527 @@
+import heapq
+import logging
+import re
+import statistics
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, deque
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter
+
+from flask import current_app
+from sqlalchemy import select
+
+import db_routing
+from caching import LRUCache
+from extensions import db
+from models import Job, JobMaterial, UserStats
+
+
+logger = logging.getLogger(__name__)
+
+
+# unit prices kept per item for median / trend
+PRICE_WINDOW = 32
+
+# prefixes matching more entries than this get a top list, kept up to
+# date in add(); narrower ones rank their whole bisected range
+HOT_PREFIX = 1000
+TOP_PER_PREFIX = 50
+# kept per list, so deletes can push items out without a rescan
+TOP_KEPT = 2 * TOP_PER_PREFIX
+
+# trigrams shared by more items than this are skipped for fuzzy matching
+MAX_POSTING = 1000
+MIN_SIMILARITY = 0.3
+
+# sorts after any character a name can contain
+_END = "\U0010ffff"
+
+_by_rank = attrgetter("rank")
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(name):
+    return _SPACES.sub(" ", str(name).casefold()).strip()
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _word_starts(key):
+    yield 0
+    for i, ch in enumerate(key):
+        if ch == " ":
+            yield i + 1
+
+
+def _stamp(when):
+    return (when - datetime.min).total_seconds() if when else 0.0
+
+
+# =========================
+# PER-USER CATALOG
+# =========================
+
+class Item:
+    __slots__ = ("key", "name", "uses", "prices", "last_used", "rank")
+
+    def __init__(self, key, name):
+        self.key = key
+        self.name = name
+        self.uses = 0
+        self.prices = deque(maxlen=PRICE_WINDOW)
+        self.last_used = None
+        self.rank = (0, 0.0, key)
+
+    def add(self, name, unit_price, used_at):
+        self.name = name  # latest spelling wins
+        self.uses += 1
+        self.prices.append(unit_price)
+        if used_at is not None and (self.last_used is None or used_at >= self.last_used):
+            self.last_used = used_at
+        self._rerank()
+
+    def remove(self, unit_price):
+        # last_used can't be walked back without the history; it is kept
+        self.uses -= 1
+        try:
+            self.prices.remove(unit_price)
+        except ValueError:
+            pass  # already out of the window
+        self._rerank()
+
+    def _rerank(self):
+        # sorts best first: most used, then most recently used, then by name
+        self.rank = (-self.uses, -_stamp(self.last_used), self.key)
+
+    def trend_percent(self):
+        """Change of the newer half of the price window vs the older half."""
+        if len(self.prices) < 4:
+            return None
+        prices = list(self.prices)
+        half = len(prices) // 2
+        old = statistics.fmean(prices[:half])
+        new = statistics.fmean(prices[-half:])
+        if not old:
+            return None
+        return round((new - old) / old * 100, 2)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "uses": self.uses,
+            "last_price": self.prices[-1] if self.prices else None,
+            "median_price": round(statistics.median(self.prices), 2) if self.prices else None,
+            "trend_percent": self.trend_percent(),
+            "last_used": self.last_used.isoformat() if self.last_used else None,
+        }
+
+
+class Catalog:
+    """One user's distinct materials with a prefix and a trigram index.
+
+    ``_prefixes`` is a sorted list of (name from each word start, key,
+    item), so "nym" finds "кабел nym 3x2.5" with two bisects; ``_grams``
+    maps each trigram to the keys containing it for typo-tolerant
+    fallback; ``_top`` holds the best-ranked items of every prefix that
+    matched more than ``HOT_PREFIX`` entries when the catalog was built.
+    All are updated in place as lines are added and removed. Bulk loads
+    pass ``keep_sorted=False`` and call ``finish()``.
+
+    ``version`` is the ``user_stats`` data version the catalog reflects,
+    or None once that is no longer known; ``built_version`` is the one
+    it was built at.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self.built_version = None
+        self.items = {}
+        self._prefixes = []
+        self._grams = {}
+        self._top = {}
+        # top lists that deletes left too short; rescanned on next use
+        self._short = set()
+        self._lock = threading.Lock()
+
+    def add(self, name, unit_price, used_at=None, keep_sorted=True):
+        key = normalize(name)
+        if not key:
+            return
+
+        with self._lock:
+            item = self.items.get(key)
+            if item is None:
+                item = self.items[key] = Item(key, name)
+                for start in _word_starts(key):
+                    # (text, key) is unique, so the item is never compared
+                    entry = (key[start:], key, item)
+                    if keep_sorted:
+                        insort(self._prefixes, entry)
+                    else:
+                        self._prefixes.append(entry)
+                for gram in _trigrams(key):
+                    self._grams.setdefault(gram, set()).add(key)
+
+            item.add(name, float(unit_price), used_at)
+            if keep_sorted:
+                self._promote(item)
+
+    def remove(self, name, unit_price):
+        """Take back one line added with ``add`` (its job was deleted)."""
+        key = normalize(name)
+        with self._lock:
+            item = self.items.get(key)
+            if item is None:
+                return
+
+            old_rank = item.rank
+            item.remove(float(unit_price))
+            if item.uses > 0:
+                self._demote(item, old_rank)
+                return
+
+            del self.items[key]
+            for start in _word_starts(key):
+                i = bisect_left(self._prefixes, (key[start:], key))
+                if i < len(self._prefixes) and self._prefixes[i][1] == key:
+                    del self._prefixes[i]
+            for gram in _trigrams(key):
+                keys = self._grams.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._grams[gram]
+            for prefix, top in self._top_lists(item):
+                if item in top:
+                    top.remove(item)
+                    self._check_short(prefix, top)
+
+    def _top_lists(self, item):
+        key = item.key
+        for start in _word_starts(key):
+            # a hot prefix's shorter prefixes are hot too
+            for end in range(start + 1, len(key) + 1):
+                prefix = key[start:end]
+                top = self._top.get(prefix)
+                if top is None:
+                    break
+                yield prefix, top
+
+    def _promote(self, item):
+        # every item outside a list ranks at or below its last entry
+        for _, top in self._top_lists(item):
+            if item in top:
+                top.sort(key=_by_rank)
+            elif top and item.rank < top[-1].rank:
+                insort(top, item, key=_by_rank)
+                del top[TOP_KEPT:]
+
+    def _demote(self, item, old_rank):
+        for prefix, top in self._top_lists(item):
+            if item not in top:
+                continue
+            # it stays only while it still beats everything outside
+            bound = old_rank if top[-1] is item else top[-1].rank
+            top.remove(item)
+            if item.rank <= bound:
+                insort(top, item, key=_by_rank)
+            self._check_short(prefix, top)
+
+    def _check_short(self, prefix, top):
+        if len(top) < TOP_PER_PREFIX:
+            self._short.add(prefix)
+
+    def _range(self, q, lo=0):
+        start = bisect_left(self._prefixes, (q,), lo=lo)
+        return start, bisect_left(self._prefixes, (q + _END,), lo=start)
+
+    def finish(self):
+        """Sort the indexes after a ``keep_sorted=False`` bulk load."""
+        with self._lock:
+            self._prefixes.sort()
+            self._top = {}
+            self._short = set()
+
+            # walk the prefixes wide enough to be hot, one child per
+            # distinct next character
+            pending = [("", 0, len(self._prefixes))]
+            while pending:
+                prefix, start, end = pending.pop()
+                if prefix:
+                    self._top[prefix] = self._rank_range(start, end, TOP_KEPT)
+
+                pos = start
+                while pos < end:
+                    text = self._prefixes[pos][0]
+                    if len(text) == len(prefix):
+                        pos += 1
+                        continue
+                    child = text[:len(prefix) + 1]
+                    child_start, child_end = self._range(child, lo=pos)
+                    if child_end - child_start > HOT_PREFIX:
+                        pending.append((child, child_start, child_end))
+                    pos = child_end
+
+    # -----------------------
+    # LOOKUP
+    # -----------------------
+
+    def _rank_range(self, start, end, limit):
+        matches = {item for _, _, item in self._prefixes[start:end]}
+        return heapq.nsmallest(limit, matches, key=_by_rank)
+
+    def _prefix_matches(self, q, limit):
+        top = self._top.get(q)
+        if top is not None and limit <= TOP_PER_PREFIX:
+            if q in self._short:
+                top = self._top[q] = self._rank_range(*self._range(q), TOP_KEPT)
+                self._short.discard(q)
+            return top[:limit]
+
+        return self._rank_range(*self._range(q), limit)
+
+    def _fuzzy_matches(self, q, exclude, limit):
+        grams = _trigrams(q)
+        postings = sorted(
+            (self._grams[g] for g in grams if g in self._grams), key=len
+        )
+        usable = [p for p in postings if len(p) <= MAX_POSTING]
+
+        overlap = Counter()
+        for posting in usable:
+            overlap.update(posting)
+        if not usable and postings:
+            # only common trigrams: rank a bounded slice of the rarest one
+            overlap.update(islice(postings[0], MAX_POSTING))
+
+        scored = []
+        for key, shared in overlap.items():
+            if key in exclude:
+                continue
+            score = shared / (len(grams) + len(key) + 2 - shared)
+            if score >= MIN_SIMILARITY:
+                scored.append((score, self.items[key].uses, key))
+
+        return [key for _, _, key in heapq.nlargest(limit, scored)]
+
+    def suggest(self, q, limit=10):
+        q = normalize(q)
+        if not q:
+            return []
+
+        with self._lock:
+            found = self._prefix_matches(q, limit)
+
+            if len(found) < limit and len(q) >= 3:
+                exclude = {item.key for item in found}
+                found += [
+                    self.items[k]
+                    for k in self._fuzzy_matches(q, exclude, limit - len(found))
+                ]
+
+            return [item.to_dict() for item in found]
+
+
+# =========================
+# CACHE OF CATALOGS
+# =========================
+
+class CatalogCache(LRUCache):
+    """LRU of per-user catalogs bounded by their total item count.
+
+    Catalogs range from a handful of items to tens of thousands, so
+    ``maxsize`` counts items, not catalogs. Lines recorded in place
+    are counted at the next put.
+    """
+
+    def __init__(self, maxsize):
+        super().__init__(maxsize=maxsize)
+
+    def _items(self):
+        return sum(len(catalog.items) for catalog, _ in self._data.values())
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._before_access()
+
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+
+            # the catalog just put stays even if it alone is over the limit
+            total = self._items()
+            while total > self.maxsize and len(self._data) > 1:
+                _, (evicted, _) = self._data.popitem(last=False)
+                total -= len(evicted.items)
+                self.evictions += 1
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats["items"] = self._items()
+        return stats
+
+
+# per worker; kept current by the writes made here, rebuilt in the
+# background once another worker's write moves the user's data version
+cache = CatalogCache(maxsize=200000)
+
+# users whose catalog is being rebuilt in the background
+_builds = set()
+_builds_lock = threading.Lock()
+
+
+def _version(user_id):
+    # read from the table: the session may hold an older UserStats
+    version = db.session.scalar(
+        select(UserStats.version).where(UserStats.user_id == user_id)
+    )
+    return version or 0
+
+
+def build(user_id):
+    """Catalog from the user's whole job_materials history, oldest first."""
+    version = _version(user_id)
+    catalog = Catalog()
+
+    rows = db.session.execute(
+        select(JobMaterial.name, JobMaterial.unit_price, Job.created_at)
+        .join(Job, Job.id == JobMaterial.job_id)
+        .where(Job.user_id == user_id)
+        .order_by(Job.created_at, JobMaterial.id)
+    )
+    for name, unit_price, created_at in rows:
+        catalog.add(name, unit_price, created_at, keep_sorted=False)
+
+    # one sort instead of an insort per distinct item
+    catalog.finish()
+
+    # a write that landed while we were reading leaves it unversioned,
+    # so the next lookup rebuilds it
+    if _version(user_id) == version:
+        catalog.version = catalog.built_version = version
+    return catalog
+
+
+def _put(user_id, catalog):
+    with _builds_lock:
+        cached = cache.peek(user_id)
+        if cached is None or (cached.version or 0) <= (catalog.version or 0):
+            cache.put(user_id, catalog)
+
+
+def _rebuild(app, user_id):
+    catalog = None
+    with app.app_context():
+        try:
+            catalog = build(user_id)
+        except Exception:
+            logger.exception("materials catalog rebuild for user %s failed", user_id)
+        finally:
+            db.session.remove()
+
+    if catalog is not None:
+        _put(user_id, catalog)
+    with _builds_lock:
+        _builds.discard(user_id)
+
+
+def get(user_id):
+    catalog = cache.get(user_id)
+    if catalog is None:
+        # cold: nothing to serve meanwhile, so build inline
+        catalog = build(user_id)
+        _put(user_id, catalog)
+        return catalog
+
+    # a lagging replica can read an older version; only newer means stale
+    if catalog.version is None or _version(user_id) > catalog.version:
+        with _builds_lock:
+            start = user_id not in _builds
+            _builds.add(user_id)
+        if start:
+            threading.Thread(
+                target=_rebuild,
+                args=(current_app._get_current_object(), user_id),
+                name="materials-catalog",
+                daemon=True,
+            ).start()
+
+    # the stale catalog is at most a few writes behind; serve it meanwhile
+    return catalog
+
+
+def suggest(user_id, q, limit=10):
+    return get(user_id).suggest(q, limit)
+
+
+def _apply(user_id, change):
+    """Apply a just-committed write to the cached catalog, if it is current.
+
+    Every write moves the data version by one, but a group commit moves
+    it once for several jobs of a user, so a catalog already at the new
+    version still takes the change unless it was built there.
+    """
+    catalog = cache.peek(user_id)
+    if catalog is None:
+        return
+
+    with db_routing.use_primary():
+        version = _version(user_id)
+
+    with _builds_lock:
+        current = catalog.version
+        if current == version - 1 or (current == version and catalog.built_version != version):
+            catalog.version = version
+        else:
+            # missed someone else's write: rebuilt on next use
+            catalog.version = None
+            return
+
+    change(catalog)
+
+
+def record(user_id, materials, used_at=None):
+    """Add freshly committed material lines to the cached catalog."""
+    used_at = used_at or datetime.utcnow()
+
+    def change(catalog):
+        for m in materials:
+            catalog.add(m["name"], m["unit_price"], used_at)
+
+    _apply(user_id, change)
+
+
+def record_import(user_id, jobs):
+    """``record`` for a committed import chunk of (materials, created_at)."""
+    now = datetime.utcnow()
+
+    def change(catalog):
+        for materials, created_at in jobs:
+            for m in materials:
+                catalog.add(m["name"], m["unit_price"], created_at or now)
+
+    _apply(user_id, change)
+
+
+def remove(user_id, lines):
+    """Take a deleted job's (name, unit_price) lines out of the cached catalog."""
+
+    def change(catalog):
+        for name, unit_price in lines:
+            catalog.remove(name, unit_price)
+
+    _apply(user_id, change)
+
+
+def stats():
+    return cache.stats()
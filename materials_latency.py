@@ -0,0 +1,129 @@
+"""Materials typeahead latency check.
+
+Builds a synthetic catalog of ``--items`` distinct material names (no
+database), replays short (1-2 character), prefix, mid-name and
+misspelled queries against ``Catalog.suggest`` and fails if the p99 of
+any kind exceeds the budget. Every tenth query is instead the first one
+after a delete (of the best match for a short query) or an import
+batch, which pays for whatever the change left to redo.
+
+    python materials_latency.py [--items 100000] [--budget-ms 5]   # or: flask check-materials-latency
+"""
+import argparse
+import random
+import sys
+import time
+
+from materials_catalog import Catalog
+
+
+DEFAULT_BUDGET_MS = 5.0
+
+WORDS = (
+    "кабел", "nym", "шпакловка", "силикон", "плочки", "лепило", "гипсокартон",
+    "профил", "винт", "дюбел", "боя", "грунд", "тръба", "фитинг", "кран",
+    "смесител", "контакт", "ключ", "лампа", "ламинат", "перваз", "пяна",
+    "white", "pro", "eco", "mat", "гланц", "бял", "сив", "черен",
+)
+
+
+def random_name(rng):
+    words = rng.sample(WORDS, rng.randint(1, 3))
+    return " ".join(words) + f" {rng.randint(1, 999)}x{rng.choice((1.5, 2.5, 4, 6, 10))}"
+
+
+def random_query(rng, names):
+    """(kind, query) for a random name."""
+    name = rng.choice(names)
+    roll = rng.random()
+    if roll < 0.3:
+        # the first keystrokes: match a large share of the catalog
+        word = rng.choice(name.split())
+        return "short", word[:rng.randint(1, 2)]
+    if roll < 0.6:
+        return "prefix", name[:rng.randint(3, 8)]
+    if roll < 0.8:
+        words = name.split()
+        return "mid-name", " ".join(words[rng.randrange(len(words)):])[:rng.randint(2, 8)]
+    # a typo: drop one character of a longer prefix
+    prefix = name[:rng.randint(4, 10)]
+    i = rng.randrange(len(prefix))
+    return "typo", prefix[:i] + prefix[i + 1:]
+
+
+def _change(rng, catalog, names, lines):
+    """Delete or import some lines; (kind, query) that sees the change."""
+    if rng.random() < 0.5:
+        word = rng.choice(rng.choice(names).split())
+        q = word[:rng.randint(1, 2)]
+        found = catalog.suggest(q, 1)
+        if found:
+            name = found[0]["name"]
+            for price in lines.pop(name, ()):
+                catalog.remove(name, price)
+        return "after-delete", q
+
+    batch = rng.sample(names, 50)
+    for name in batch:
+        price = rng.uniform(0.5, 200)
+        catalog.add(name, price)
+        lines.setdefault(name, []).append(price)
+    return "after-import", batch[0][:rng.randint(1, 4)]
+
+
+def _p(timings, fraction):
+    return timings[min(int(len(timings) * fraction), len(timings) - 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+
+    names = set()
+    while len(names) < args.items:
+        names.add(random_name(rng))
+    names = sorted(names)
+
+    catalog = Catalog()
+    lines = {}
+    t = time.perf_counter()
+    for name in names:
+        for _ in range(rng.randint(1, 3)):
+            price = rng.uniform(0.5, 200)
+            catalog.add(name, price, keep_sorted=False)
+            lines.setdefault(name, []).append(price)
+    catalog.finish()
+    build_ms = (time.perf_counter() - t) * 1000
+
+    by_kind = {}
+    for i in range(args.queries):
+        if i % 10 == 9:
+            kind, q = _change(rng, catalog, names, lines)
+        else:
+            kind, q = random_query(rng, names)
+        t = time.perf_counter()
+        catalog.suggest(q)
+        by_kind.setdefault(kind, []).append((time.perf_counter() - t) * 1000)
+
+    print(f"{len(catalog.items)} items built in {build_ms:.0f} ms "
+          f"(budget p99 {args.budget_ms} ms)")
+
+    failed = False
+    for kind, timings in sorted(by_kind.items()):
+        timings.sort()
+        p99 = _p(timings, 0.99)
+        failed = failed or p99 > args.budget_ms
+        print(f"  {kind:>12}: {len(timings)} queries, p50 {_p(timings, 0.5):.3f} ms, "
+              f"p99 {p99:.3f} ms, max {timings[-1]:.3f} ms")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
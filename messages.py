@@ -0,0 +1,63 @@
+import string
+from typing import Dict
+
+
+DEFAULT_LOCALE = "bg"
+
+FIELDS = (
+    "description", "hours", "hourly_rate", "materials_cost", "labor",
+    "transport", "final_price",
+)
+
+
+class MessageTemplate:
+    """A client-message template parsed and checked once at import.
+
+    ``render`` is then a single ``str.format_map`` call; unknown or
+    missing placeholders fail here rather than on a request.
+    """
+
+    __slots__ = ("locale", "text", "_fill")
+
+    def __init__(self, locale: str, text: str):
+        names = {
+            field.split(".")[0].split("[")[0]
+            for _, field, _, _ in string.Formatter().parse(text)
+            if field is not None
+        }
+        unknown = names - set(FIELDS)
+        if unknown:
+            raise ValueError(f"{locale}: unknown placeholders {sorted(unknown)}")
+
+        self.locale = locale
+        self.text = text
+        self._fill = text.format_map
+
+    def render(self, values: Dict) -> str:
+        return self._fill(values)
+
+
+TEMPLATES = {
+    "bg": MessageTemplate("bg", (
+        "Здравейте,\n\n"
+        "Относно \"{description}\":\n\n"
+        "Материали: {materials_cost:.2f} €\n"
+        "Труд ({hours} ч. × {hourly_rate} €): {labor:.2f} €\n"
+        "Транспорт: {transport:.2f} €\n\n"
+        "Крайна цена: {final_price:.2f} €\n\n"
+        "Поздрави,"
+    )),
+    "en": MessageTemplate("en", (
+        "Hello,\n\n"
+        "Regarding \"{description}\":\n\n"
+        "Materials: {materials_cost:.2f} €\n"
+        "Labour ({hours} h × {hourly_rate} €): {labor:.2f} €\n"
+        "Transport: {transport:.2f} €\n\n"
+        "Total price: {final_price:.2f} €\n\n"
+        "Kind regards,"
+    )),
+}
+
+
+def client_message(locale: str = DEFAULT_LOCALE, **values) -> str:
+    return TEMPLATES[locale].render(values)
@@ -0,0 +1,189 @@
+import math
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Sequence, Tuple
+
+
+# seconds; roughly Prometheus' defaults with a finer low end
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# =========================
+# METRIC TYPES
+# =========================
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name, _labels(self.label_names, labels), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [per-bucket counts..., sum, count]
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+
+        for labels, series in items:
+            running = 0
+            for bound, count in zip(self.buckets, series):
+                running += count
+                le = 'le="' + _number(bound) + '"'
+                yield self.name + "_bucket", _labels(self.label_names, labels, le), running
+            yield self.name + "_sum", _labels(self.label_names, labels), series[-2]
+            yield self.name + "_count", _labels(self.label_names, labels), series[-1]
+
+
+class GaugeCallback:
+    """Gauges read at scrape time from ``fn() -> {label value: number}``.
+
+    With a tuple of ``label`` names the keys are tuples of values.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, label: str, fn: Callable[[], Dict]):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.fn = fn
+
+    def samples(self):
+        names = self.label if isinstance(self.label, tuple) else (self.label,)
+        for key, value in sorted(self.fn().items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values = key if isinstance(key, tuple) else (key,)
+                yield self.name, _labels(names, values), value
+
+
+# =========================
+# REGISTRY
+# =========================
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # re-registering (a second create_app) keeps the first instance
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labels=()):
+    return REGISTRY.register(Counter(name, help, labels))
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
+
+
+def gauge_callback(name, help, label, fn):
+    return REGISTRY.register(GaugeCallback(name, help, label, fn))
+
+
+# =========================
+# PRICING TIMINGS
+# =========================
+
+pricing_seconds = histogram(
+    "pricing_call_duration_seconds",
+    "Time spent in pricing-engine entry points.",
+    labels=("function",),
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+
+
+def timed(fn):
+    """Record each call of ``fn`` in ``pricing_call_duration_seconds``."""
+    name = fn.__name__
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            pricing_seconds.observe(time.perf_counter() - start, name)
+
+    return wrapper
@@ -28,6 +28,17 @@ class User(UserMixin, db.Model):
 class Job(db.Model):
     __tablename__ = "jobs"
 
+    # user_id is the leading column, so this also serves plain user filters
+    __table_args__ = (
+        db.Index("ix_jobs_user_id_created_at", "user_id", "created_at"),
+        db.Index(
+            "uq_jobs_user_id_idempotency_key",
+            "user_id",
+            "idempotency_key",
+            unique=True
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     # 🚨 NOT nullable anymore
@@ -51,6 +62,11 @@ class Job(db.Model):
     client_message = db.Column(db.Text, nullable=False)
     engine_version = db.Column(db.String(20), default="v1.4")
 
+    # set by POST /api/quotes so a retried save returns the same job
+    idempotency_key = db.Column(db.String(64), nullable=True)
+    # sha256 of the request that used the key; a reuse must match it
+    idempotency_hash = db.Column(db.String(64), nullable=True)
+
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # 🔥 relationship
@@ -70,7 +86,8 @@ class JobMaterial(db.Model):
     job_id = db.Column(
         db.Integer,
         db.ForeignKey("jobs.id"),
-        nullable=False
+        nullable=False,
+        index=True
     )
 
     name = db.Column(db.String(255), nullable=False)
@@ -79,3 +96,33 @@ class JobMaterial(db.Model):
     total_price = db.Column(db.Float, nullable=False)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class UserStats(db.Model):
+    __tablename__ = "user_stats"
+
+    # 🔥 rollup kept in sync by save_job / delete_job
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id"),
+        primary_key=True
+    )
+
+    total_jobs = db.Column(db.Integer, nullable=False, default=0)
+    total_profit = db.Column(db.Float, nullable=False, default=0)
+    total_revenue = db.Column(db.Float, nullable=False, default=0)
+    total_materials = db.Column(db.Float, nullable=False, default=0)
+
+    # bumped on every job write; drives ETags on the polled endpoints
+    version = db.Column(
+        db.Integer,
+        nullable=False,
+        default=1,
+        server_default="1"
+    )
+
+    updated_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow
+    )
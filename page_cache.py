@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import threading
+
+from flask import current_app, render_template, request
+
+
+# marketing pages with no per-request content
+TEMPLATES = ("index.html", "how-it-works.html")
+
+
+class RenderedPage:
+    """One template rendered once, with its compressed variants."""
+
+    __slots__ = ("variants",)
+
+    def __init__(self, html):
+        body = html.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:16]
+
+        # {content-coding: (body, strong etag)}; the tag differs per coding
+        self.variants = {"identity": (body, digest)}
+        self.variants["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f"{digest}-gz")
+
+        brotli = _brotli()
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body, quality=11), f"{digest}-br")
+
+    def choose(self, accept_encodings):
+        for coding in ("br", "gzip"):
+            if coding in self.variants and accept_encodings[coding]:
+                return coding
+        return "identity"
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class PageCache:
+    """Rendered pages kept for the life of the process (one deploy).
+
+    Pages are rendered on first use or up front by ``warm``. With
+    ``enabled`` off (debug, template auto-reload) every hit renders.
+    """
+
+    def __init__(self, enabled=True, max_age=86400):
+        self.enabled = enabled
+        self.max_age = max_age
+
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def get(self, template):
+        page = self._pages.get(template)
+        if page is None:
+            with self._lock:
+                page = self._pages.get(template)
+                if page is None:
+                    page = self._pages[template] = RenderedPage(render_template(template))
+        return page
+
+    def warm(self, app):
+        with app.test_request_context("/"):
+            for template in TEMPLATES:
+                self.get(template)
+
+
+def init_app(app):
+    cache = PageCache(
+        enabled=(
+            app.config["PAGE_CACHE_ENABLED"]
+            and not app.debug
+            and not app.config["TEMPLATES_AUTO_RELOAD"]
+        ),
+        max_age=app.config["PAGE_CACHE_MAX_AGE"],
+    )
+    app.extensions["page_cache"] = cache
+
+    if cache.enabled and app.config["PAGE_CACHE_WARM"]:
+        # under gunicorn --preload this runs once and workers share the pages
+        cache.warm(app)
+
+
+def serve(template):
+    """Response for a cached page: negotiated encoding, ETag, 304s."""
+    cache = current_app.extensions["page_cache"]
+    if not cache.enabled:
+        return render_template(template)
+
+    page = cache.get(template)
+    coding = page.choose(request.accept_encodings)
+    body, tag = page.variants[coding]
+
+    if request.if_none_match.contains(tag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype="text/html")
+        if coding != "identity":
+            response.headers["Content-Encoding"] = coding
+
+    response.set_etag(tag)
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = f"public, max-age={cache.max_age}"
+    return response
@@ -0,0 +1,40 @@
+from flask import Blueprint, render_template
+from flask_login import login_required
+
+import page_cache
+
+
+bp = Blueprint("pages", __name__)
+
+
+# =========================
+# PAGE ROUTES
+# =========================
+
+@bp.route("/")
+def landing():
+    return page_cache.serve("index.html")
+
+
+@bp.route("/kak-raboti")
+@bp.route("/how-it-works")
+def how_it_works():
+    return page_cache.serve("how-it-works.html")
+
+
+@bp.route("/dashboard")
+@login_required
+def dashboard():
+    return render_template("dashboard.html")
+
+
+@bp.route("/demo")
+@login_required
+def demo():
+    return render_template("demo.html")
+
+
+@bp.route("/analytics")
+@login_required
+def analytics_page():
+    return render_template("analytics.html")
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+DEFAULT_ROUNDS = 12
+
+
+class HashingBusy(Exception):
+    """The hashing queue is full; the caller should answer 503."""
+
+
+def hash_rounds(hashed: str) -> int:
+    # $2b$12$<salt+hash>
+    return int(hashed.split("$")[2])
+
+
+def calibrate(target_ms: float, password: bytes = b"calibration") -> int:
+    """Highest cost factor whose hash time stays within ``target_ms``."""
+    import bcrypt
+
+    rounds = MIN_ROUNDS
+    while rounds < MAX_ROUNDS:
+        start = time.perf_counter()
+        bcrypt.hashpw(password, bcrypt.gensalt(rounds + 1))
+        if (time.perf_counter() - start) * 1000 > target_ms:
+            break
+        rounds += 1
+    return rounds
+
+
+class PasswordHasher:
+    """bcrypt on a bounded thread pool with back-pressure.
+
+    The request thread still waits for its own hash; the pool bounds how
+    many run at once (bcrypt releases the GIL, so they run in parallel
+    with other request threads). At most ``max_pending`` hashes may be
+    running or queued; past that ``HashingBusy`` is raised after ``wait``
+    seconds instead of letting a login spike pile up behind the pool.
+
+    The cost factor is ``rounds`` if given, else calibrated once to
+    ``target_ms`` (by ``prepare()`` at start-up), else bcrypt's default
+    of 12. bcrypt itself is imported on first use so app start-up only
+    pays for it when calibrating.
+    """
+
+    def __init__(self, workers=2, max_pending=16, wait=0.5,
+                 rounds=None, target_ms=None):
+        self.configure(workers, max_pending, wait, rounds, target_ms)
+
+    def configure(self, workers=2, max_pending=16, wait=0.5,
+                  rounds=None, target_ms=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait = wait
+        self._rounds = rounds
+        self.target_ms = target_ms
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    @property
+    def rounds(self) -> int:
+        if self._rounds is None:
+            with self._lock:
+                if self._rounds is None:
+                    self._rounds = (
+                        calibrate(self.target_ms)
+                        if self.target_ms else DEFAULT_ROUNDS
+                    )
+        return self._rounds
+
+    def prepare(self):
+        """Settle the cost factor now instead of on the first hash."""
+        return self.rounds
+
+    def _count(self, name):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_rehash(self):
+        self._count("rehashed")
+
+    def _pool(self):
+        # threads don't survive fork: build the pool in the worker process
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            self._count("rejected")
+            raise HashingBusy()
+
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        result = future.result()
+        self._count("completed")
+        return result
+
+    def hash(self, password: str) -> str:
+        import bcrypt
+
+        salt = bcrypt.gensalt(self.rounds)
+        return self._run(bcrypt.hashpw, password.encode(), salt).decode()
+
+    def verify(self, password: str, hashed: str) -> bool:
+        import bcrypt
+
+        return self._run(bcrypt.checkpw, password.encode(), hashed.encode())
+
+    def needs_rehash(self, hashed: str) -> bool:
+        # only ever upward: workers can calibrate a round apart, and a
+        # login must not undo a stronger hash made by another one
+        try:
+            return hash_rounds(hashed) < self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "rounds": self.rounds,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+        }
+
+
+hasher = PasswordHasher()
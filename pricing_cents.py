@@ -0,0 +1,386 @@
+import math
+from typing import Dict, NamedTuple, Optional
+
+import messages
+from metrics import timed
+from pricing_engine import ENGINE_VERSION, SETTINGS, _quote_key, quote_cache
+
+
+# A step whose value lands this close to a half cent (relative to the
+# size of its operands) is re-derived with the float v3.0 formula, since
+# only there can float and integer arithmetic round differently.
+TIE_TOLERANCE = 1e-9
+
+# past ~100 bn € float sums of cents stop being exact in v3.0 itself
+MAX_CENTS = 10 ** 13
+
+
+# =========================
+# RATE PROFILES
+# =========================
+
+class RateProfile(NamedTuple):
+    """Immutable per-tenant pricing constants, precomputed in cents.
+
+    The euro floats are kept alongside for the (rare) steps that have to
+    be re-derived the way v3.0 computes them.
+    """
+    name: str
+    visit_fee: float
+    transport_per_km: float
+    min_offer: float
+    visit_fee_cents: int
+    per_km_cents: float
+    min_offer_cents: int
+
+    @classmethod
+    def build(cls, name, visit_fee, transport_per_km, min_offer):
+        visit_fee_cents = _whole_cents(visit_fee, "visit_fee")
+        min_offer_cents = _whole_cents(min_offer, "min_offer")
+        transport_per_km = float(transport_per_km)
+
+        if not math.isfinite(transport_per_km):
+            raise ValueError("transport_per_km must be a finite number")
+
+        return cls(
+            name=name,
+            visit_fee=visit_fee_cents / 100,
+            transport_per_km=transport_per_km,
+            min_offer=min_offer_cents / 100,
+            visit_fee_cents=visit_fee_cents,
+            # a per-km rate may carry fractions of a cent
+            per_km_cents=transport_per_km * 100,
+            min_offer_cents=min_offer_cents,
+        )
+
+    def as_settings(self) -> Dict:
+        """The profile in ``SETTINGS`` form, for the float/batch paths."""
+        return {
+            "transport_per_km": self.transport_per_km,
+            "visit_fee": self.visit_fee,
+            "min_offer": self.min_offer,
+        }
+
+
+def _whole_cents(value, field) -> int:
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"{field} must be a finite number")
+
+    cents = round(value * 100)
+    if abs(value * 100 - cents) > 1e-6:
+        raise ValueError(f"{field} must be a whole number of cents")
+    return cents
+
+
+_default = None
+
+
+def default_profile() -> RateProfile:
+    """Profile built from the global ``SETTINGS`` (rebuilt if they change)."""
+    global _default
+
+    key = tuple(sorted(SETTINGS.items()))
+    if _default is None or _default[0] != key:
+        _default = (key, RateProfile.build("default", **{
+            "visit_fee": SETTINGS["visit_fee"],
+            "transport_per_km": SETTINGS["transport_per_km"],
+            "min_offer": SETTINGS["min_offer"],
+        }))
+    return _default[1]
+
+
+# =========================
+# INTEGER-CENTS CORE
+# =========================
+
+def _cents(value: float, scale: float) -> Optional[int]:
+    """Round an amount already expressed in cents; None if near a tie."""
+    if not math.isfinite(value):
+        raise ValueError("amounts must be finite numbers")
+
+    n = round(value)
+    if 0.5 - abs(value - n) <= TIE_TOLERANCE * max(1.0, scale):
+        return None
+    return n
+
+
+def _v3_cents(amount: float) -> int:
+    # exactly v3.0: round(x, 2) on the float expression, then to cents
+    return round(round(amount, 2) * 100)
+
+
+def _line_cents(m: Dict):
+    price = float(m.get("unit_price", 0))
+    qty = float(m.get("quantity", 0))
+
+    y = price * qty * 100
+    total_c = _cents(y, abs(y))
+    if total_c is None:
+        total_c = _v3_cents(price * qty)
+
+    return price, qty, total_c
+
+
+def _line(m: Dict) -> Dict:
+    price, qty, total_c = _line_cents(m)
+    return {
+        "name": m.get("name"),
+        "unit_price": price,
+        "quantity": qty,
+        "total_price": total_c / 100
+    }
+
+
+class Quote:
+    """A priced quote as plain numbers (amounts in cents).
+
+    The response dict is built per call by ``to_dict``, which only pays
+    for the parts asked for: the material echo is rebuilt from the
+    caller's own lines and the client message is rendered once per
+    locale and kept, so cached quotes reuse it.
+    """
+
+    __slots__ = (
+        "description", "hours", "hourly_rate", "profit_percent", "distance",
+        "materials_c", "transport_c", "base_c", "labor_c", "extra_c",
+        "profit_c", "final_c", "margin", "_messages",
+    )
+
+    def __init__(self, description, hours, hourly_rate, profit_percent, distance,
+                 materials_c, transport_c, base_c, labor_c, extra_c, profit_c,
+                 final_c, margin):
+        self.description = description
+        self.hours = hours
+        self.hourly_rate = hourly_rate
+        self.profit_percent = profit_percent
+        self.distance = distance
+        self.materials_c = materials_c
+        self.transport_c = transport_c
+        self.base_c = base_c
+        self.labor_c = labor_c
+        self.extra_c = extra_c
+        self.profit_c = profit_c
+        self.final_c = final_c
+        self.margin = margin
+        self._messages = {}
+
+    def message(self, locale: str = messages.DEFAULT_LOCALE) -> str:
+        text = self._messages.get(locale)
+        if text is None:
+            text = self._messages[locale] = messages.TEMPLATES[locale].render({
+                "description": self.description,
+                "hours": self.hours,
+                "hourly_rate": self.hourly_rate,
+                "materials_cost": self.materials_c / 100,
+                "labor": self.labor_c / 100,
+                "transport": self.transport_c / 100,
+                "final_price": self.final_c / 100,
+            })
+        return text
+
+    def to_dict(self, data: Dict, fields: Optional[Dict] = None,
+                locale: str = messages.DEFAULT_LOCALE) -> Dict:
+        """The v3.0-shaped result, or only ``fields`` (see ``parse_fields``).
+
+        ``data`` is the request the materials are echoed from.
+        """
+        result = {}
+
+        def wanted(key):
+            return fields is None or key in fields
+
+        for key in ("description", "hours", "hourly_rate", "profit_percent", "distance"):
+            if wanted(key):
+                result[key] = getattr(self, key)
+
+        if wanted("materials"):
+            result["materials"] = [_line(m) for m in data.get("materials", [])]
+
+        if wanted("costs"):
+            result["costs"] = _pick({
+                "materials": self.materials_c / 100,
+                "transport": self.transport_c / 100,
+                "base_cost": self.base_c / 100
+            }, fields and fields["costs"])
+
+        if wanted("income"):
+            result["income"] = _pick({
+                "labor": self.labor_c / 100,
+                "extra_profit": self.extra_c / 100,
+                "total_profit": self.profit_c / 100,
+                "margin_percent": self.margin
+            }, fields and fields["income"])
+
+        if wanted("final_price"):
+            result["final_price"] = self.final_c / 100
+        if wanted("client_message"):
+            result["client_message"] = self.message(locale)
+        if wanted("engine_version"):
+            result["engine_version"] = ENGINE_VERSION
+
+        return result
+
+
+def _pick(group: Dict, keys) -> Dict:
+    if not keys:
+        return group
+    return {k: group[k] for k in keys}
+
+
+# =========================
+# FIELD PROJECTION
+# =========================
+
+QUOTE_FIELDS = {
+    "description": (), "hours": (), "hourly_rate": (), "profit_percent": (),
+    "distance": (), "materials": (), "final_price": (), "client_message": (),
+    "engine_version": (),
+    "costs": ("materials", "transport", "base_cost"),
+    "income": ("labor", "extra_profit", "total_profit", "margin_percent"),
+}
+
+
+def parse_fields(value) -> Optional[Dict]:
+    """``"final_price,income.total_profit"`` (or a list) -> projection.
+
+    Maps each top-level key to the set of sub-keys wanted, empty meaning
+    the whole group. None/empty means the full result.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("fields must be a comma-separated string or a list")
+
+    fields = {}
+    for item in value:
+        if not isinstance(item, str):
+            raise ValueError("fields must be strings")
+        item = item.strip()
+        if not item:
+            continue
+
+        top, _, sub = item.partition(".")
+        if top not in QUOTE_FIELDS or (sub and sub not in QUOTE_FIELDS[top]):
+            raise ValueError(f"unknown field: {item}")
+
+        if not sub:
+            fields[top] = None  # the whole group wins over any sub-keys
+        elif fields.get(top, ()) is not None:
+            fields.setdefault(top, set()).add(sub)
+
+    if not fields:
+        return None
+    return {top: tuple(sorted(keys or ())) for top, keys in fields.items()}
+
+
+def _quote(data: Dict, profile: RateProfile) -> Quote:
+    description = data.get("description", "")
+    hours = float(data.get("hours", 0))
+    hourly_rate = float(data.get("hourly_rate", 0))
+    profit_percent = float(data.get("profit_percent", 0))
+    distance = float(data.get("distance", 0))
+
+    # -----------------------
+    # MATERIALS COST
+    # -----------------------
+    materials_c = 0
+
+    for m in data.get("materials", []):
+        materials_c += _line_cents(m)[2]
+
+    # -----------------------
+    # TRANSPORT / LABOR
+    # -----------------------
+    per_km = distance * profile.per_km_cents
+    transport_c = _cents(
+        profile.visit_fee_cents + per_km, abs(profile.visit_fee_cents) + abs(per_km)
+    )
+    if transport_c is None:
+        transport_c = _v3_cents(profile.visit_fee + distance * profile.transport_per_km)
+
+    y = hours * hourly_rate * 100
+    labor_c = _cents(y, abs(y))
+    if labor_c is None:
+        labor_c = _v3_cents(hours * hourly_rate)
+
+    # sums of whole cents: exact here and in v3.0 alike
+    base_c = materials_c + transport_c
+
+    # -----------------------
+    # PROFIT & FINAL PRICE
+    # -----------------------
+    y = (base_c + labor_c) * profit_percent / 100
+    extra_c = _cents(y, (abs(base_c) + abs(labor_c)) * abs(profit_percent) / 100)
+    if extra_c is None:
+        extra_c = _v3_cents((base_c / 100 + labor_c / 100) * (profit_percent / 100))
+
+    final_c = base_c + labor_c + extra_c
+    if final_c < profile.min_offer_cents:
+        final_c = profile.min_offer_cents
+
+    profit_c = labor_c + extra_c
+
+    if max(abs(final_c), abs(base_c), abs(profit_c)) > MAX_CENTS:
+        raise ValueError("amounts are too large")
+
+    # margin in hundredths of a percent
+    if final_c:
+        y = profit_c * 10000 / final_c
+        margin_bp = _cents(y, abs(y))
+        if margin_bp is None:
+            margin_bp = _v3_cents((profit_c / 100 / (final_c / 100)) * 100)
+        margin = margin_bp / 100
+    else:
+        margin = 0
+
+    return Quote(
+        description, hours, hourly_rate, profit_percent, distance,
+        materials_c, transport_c, base_c, labor_c, extra_c, profit_c,
+        final_c, margin,
+    )
+
+
+@timed
+def изчисли_оферта_центове(data: Dict, profile: Optional[RateProfile] = None) -> Dict:
+    """``изчисли_оферта`` in integer cents with a rate profile.
+
+    Every money step is carried as an int number of cents, so totals have
+    no float residue and don't depend on material order. Rounded amounts
+    equal v3.0's to the cent (``pricing_parity.py`` checks this): a step
+    is recomputed with the v3.0 float expression whenever its value sits
+    within float error of a half cent.
+    """
+    if profile is None:
+        profile = default_profile()
+    return _quote(data, profile).to_dict(data)
+
+
+# =========================
+# CACHED ENTRY POINT
+# =========================
+
+@timed
+def изчисли_за_профил(data: Dict, profile: RateProfile, fields: Optional[Dict] = None,
+                      locale: str = messages.DEFAULT_LOCALE) -> Dict:
+    """Cached, projected ``изчисли_оферта_центове``; the profile is part of the key.
+
+    Cent totals don't depend on material order, so any permutation of
+    the same lines is served from one entry, with the materials echoed
+    in the caller's order.
+    """
+    try:
+        key = (profile, _quote_key(data))
+        hash(key)
+    except (AttributeError, TypeError, ValueError):
+        return _quote(data, profile).to_dict(data, fields, locale)
+
+    quote = quote_cache.get(key)
+
+    if quote is None:
+        quote = _quote(data, profile)
+        quote_cache.put(key, quote)
+
+    return quote.to_dict(data, fields, locale)
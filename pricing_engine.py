@@ -1,4 +1,11 @@
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+import messages
+from caching import LRUCache
+from metrics import timed
+
+if TYPE_CHECKING:
+    import numpy as np
 
 SETTINGS = {
     "transport_per_km": 1.20,
@@ -6,6 +13,10 @@ SETTINGS = {
     "min_offer": 120.0
 }
 
+ENGINE_VERSION = "v3.0"
+
+
+@timed
 def изчисли_оферта(data: Dict) -> Dict:
     description = data.get("description", "")
     hours = float(data.get("hours", 0))
@@ -75,17 +86,26 @@ def изчисли_оферта(data: Dict) -> Dict:
 
     margin = round((real_profit / final_price) * 100, 2) if final_price else 0
 
+    return _build_result(
+        description, hours, hourly_rate, profit_percent, distance,
+        materials, materials_cost, transport, base_cost,
+        labor_income, extra_profit, real_profit, margin, final_price,
+    )
+
+
+def _build_result(
+    description, hours, hourly_rate, profit_percent, distance,
+    materials, materials_cost, transport, base_cost,
+    labor_income, extra_profit, real_profit, margin, final_price,
+) -> Dict:
+
     # -----------------------
     # CLIENT MESSAGE
     # -----------------------
-    client_message = (
-        f"Здравейте,\n\n"
-        f"Относно \"{description}\":\n\n"
-        f"Материали: {materials_cost:.2f} €\n"
-        f"Труд ({hours} ч. × {hourly_rate} €): {labor_income:.2f} €\n"
-        f"Транспорт: {transport:.2f} €\n\n"
-        f"Крайна цена: {final_price:.2f} €\n\n"
-        f"Поздрави,"
+    client_message = messages.client_message(
+        description=description, hours=hours, hourly_rate=hourly_rate,
+        materials_cost=materials_cost, labor=labor_income,
+        transport=transport, final_price=final_price,
     )
 
     return {
@@ -112,5 +132,301 @@ def изчисли_оферта(data: Dict) -> Dict:
 
         "final_price": final_price,
         "client_message": client_message,
-        "engine_version": "v3.0"
+        "engine_version": ENGINE_VERSION
     }
+
+
+# =========================
+# BATCH (COLUMNAR) PRICING
+# =========================
+
+def _round2(values: "np.ndarray") -> "np.ndarray":
+    """Vectorized ``round(x, 2)`` that agrees with Python's built-in.
+
+    ``np.round`` scales by 100 first, so values whose scaled form lands
+    within float error of a .5 boundary are re-rounded in Python.
+    """
+    import numpy as np
+
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * 100.0
+    rounded = np.round(scaled) / 100.0
+
+    frac = np.abs(scaled - np.trunc(scaled))
+    tolerance = np.maximum(1e-9, np.abs(scaled) * 1e-15)
+    near_tie = np.abs(frac - 0.5) <= tolerance
+
+    if near_tie.any():
+        idx = np.nonzero(near_tie)[0]
+        rounded[idx] = [round(float(v), 2) for v in values[idx]]
+
+    return rounded
+
+
+@timed
+def изчисли_оферти(
+    hours: Sequence[float],
+    hourly_rate: Sequence[float],
+    profit_percent: Sequence[float],
+    distance: Sequence[float],
+    material_job: Sequence[int] = (),
+    material_unit_price: Sequence[float] = (),
+    material_quantity: Sequence[float] = (),
+    settings: Optional[Dict] = None,
+) -> Dict[str, "np.ndarray"]:
+    """Price many jobs in one vectorized pass.
+
+    Job inputs are parallel arrays. Materials are flattened: row ``i`` of
+    ``material_*`` belongs to job ``material_job[i]`` and rows of one job
+    keep their original order. Returns a dict of columns that match the
+    scalar ``изчисли_оферта`` value for value. ``settings`` overrides the
+    global ``SETTINGS`` (e.g. a tenant's rate profile).
+    """
+    # numpy is only needed for batch pricing; keep it off the cold path
+    import numpy as np
+
+    if settings is None:
+        settings = SETTINGS
+
+    hours = np.asarray(hours, dtype=np.float64)
+    hourly_rate = np.asarray(hourly_rate, dtype=np.float64)
+    profit_percent = np.asarray(profit_percent, dtype=np.float64)
+    distance = np.asarray(distance, dtype=np.float64)
+    n = hours.shape[0]
+
+    material_job = np.asarray(material_job, dtype=np.int64)
+    material_unit_price = np.asarray(material_unit_price, dtype=np.float64)
+    material_quantity = np.asarray(material_quantity, dtype=np.float64)
+
+    # -----------------------
+    # MATERIALS COST
+    # -----------------------
+    # bincount accumulates in input order, same as the scalar += loop
+    material_total = _round2(material_unit_price * material_quantity)
+    materials_cost = np.bincount(
+        material_job, weights=material_total, minlength=n
+    ).astype(np.float64)
+
+    return {
+        "material_total": material_total,
+        **_price_columns(
+            materials_cost, hours, hourly_rate, profit_percent, distance, settings
+        ),
+    }
+
+
+def _price_columns(
+    materials_cost: "np.ndarray",
+    hours: "np.ndarray",
+    hourly_rate,
+    profit_percent: "np.ndarray",
+    distance: "np.ndarray",
+    settings: Dict,
+) -> Dict[str, "np.ndarray"]:
+    """The per-job part of ``изчисли_оферти`` on 1-D columns (scalars broadcast)."""
+    import numpy as np
+
+    # -----------------------
+    # TRANSPORT / LABOR / BASE
+    # -----------------------
+    transport = _round2(
+        settings["visit_fee"] + distance * settings["transport_per_km"]
+    )
+    labor_income = _round2(hours * hourly_rate)
+    base_cost = _round2(materials_cost + transport)
+
+    # -----------------------
+    # PROFIT & FINAL PRICE
+    # -----------------------
+    extra_profit = _round2(
+        (base_cost + labor_income) * (profit_percent / 100)
+    )
+    final_price = _round2(base_cost + labor_income + extra_profit)
+    final_price = np.where(
+        final_price < settings["min_offer"], settings["min_offer"], final_price
+    )
+
+    real_profit = _round2(labor_income + extra_profit)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin = np.where(
+            final_price != 0,
+            _round2((real_profit / final_price) * 100),
+            0.0,
+        )
+
+    return {
+        "materials_cost": materials_cost,
+        "transport": transport,
+        "labor": labor_income,
+        "base_cost": base_cost,
+        "extra_profit": extra_profit,
+        "final_price": final_price,
+        "total_profit": real_profit,
+        "margin_percent": margin,
+    }
+
+
+@timed
+def изчисли_решетка(
+    data: Dict,
+    hours: Optional[Sequence[float]] = None,
+    profit_percent: Optional[Sequence[float]] = None,
+    distance: Optional[Sequence[float]] = None,
+    settings: Optional[Dict] = None,
+) -> Dict[str, "np.ndarray"]:
+    """Price one job over the grid hours × profit_percent × distance.
+
+    Axes left as None stay at the job's own value. The materials sum is
+    taken once (in line order, as in ``изчисли_оферта``); every column
+    comes back shaped (len(hours), len(profit_percent), len(distance)),
+    value for value equal to the scalar formula at that point.
+    """
+    import numpy as np
+
+    if settings is None:
+        settings = SETTINGS
+
+    axes = [
+        np.asarray(
+            values if values is not None else [float(data.get(name, 0))],
+            dtype=np.float64,
+        )
+        for name, values in (
+            ("hours", hours), ("profit_percent", profit_percent), ("distance", distance)
+        )
+    ]
+    grid_hours, grid_percent, grid_distance = np.meshgrid(*axes, indexing="ij")
+
+    materials_cost = 0.0
+    for m in data.get("materials", []):
+        materials_cost += round(float(m.get("unit_price", 0)) * float(m.get("quantity", 0)), 2)
+
+    cols = _price_columns(
+        np.full(grid_hours.size, materials_cost),
+        grid_hours.ravel(),
+        float(data.get("hourly_rate", 0)),
+        grid_percent.ravel(),
+        grid_distance.ravel(),
+        settings,
+    )
+    return {name: col.reshape(grid_hours.shape) for name, col in cols.items()}
+
+
+@timed
+def изчисли_пакет(jobs: List[Dict], settings: Optional[Dict] = None) -> List[Dict]:
+    """Batch version of ``изчисли_оферта`` for a list of request dicts.
+
+    Flattens the jobs into columns, prices them with ``изчисли_оферти``
+    and returns results shaped exactly like the scalar path.
+    """
+    descriptions, hours, rates, percents, distances = [], [], [], [], []
+    material_job, unit_prices, quantities, names = [], [], [], []
+
+    for i, data in enumerate(jobs):
+        try:
+            descriptions.append(data.get("description", ""))
+            hours.append(float(data.get("hours", 0)))
+            rates.append(float(data.get("hourly_rate", 0)))
+            percents.append(float(data.get("profit_percent", 0)))
+            distances.append(float(data.get("distance", 0)))
+
+            for m in data.get("materials", []):
+                material_job.append(i)
+                names.append(m.get("name"))
+                unit_prices.append(float(m.get("unit_price", 0)))
+                quantities.append(float(m.get("quantity", 0)))
+        except (AttributeError, TypeError, ValueError) as e:
+            raise ValueError(f"job {i}: {e}") from e
+
+    cols = изчисли_оферти(
+        hours, rates, percents, distances,
+        material_job, unit_prices, quantities,
+        settings=settings,
+    )
+
+    # back to Python floats so formatting matches the scalar path
+    cols = {k: v.tolist() for k, v in cols.items()}
+    material_total = cols["material_total"]
+
+    per_job: List[List[Dict]] = [[] for _ in jobs]
+    for row, job_idx in enumerate(material_job):
+        per_job[job_idx].append({
+            "name": names[row],
+            "unit_price": unit_prices[row],
+            "quantity": quantities[row],
+            "total_price": material_total[row]
+        })
+
+    return [
+        _build_result(
+            descriptions[i], hours[i], rates[i], percents[i], distances[i],
+            per_job[i], cols["materials_cost"][i], cols["transport"][i],
+            cols["base_cost"][i], cols["labor"][i], cols["extra_profit"][i],
+            cols["total_profit"][i],
+            cols["margin_percent"][i] if cols["final_price"][i] else 0,
+            cols["final_price"][i],
+        )
+        for i in range(len(jobs))
+    ]
+
+
+# =========================
+# QUOTE CACHE (LRU + TTL)
+# =========================
+
+def _num(value) -> float:
+    # -0.0 and 0.0 must share a key
+    return float(value) + 0.0
+
+
+def _material_key(m: Dict):
+    name = m.get("name")
+    return (
+        name is None,
+        name if isinstance(name, str) else repr(name),
+        _num(m.get("unit_price", 0)),
+        _num(m.get("quantity", 0)),
+    )
+
+
+def _quote_key(data: Dict):
+    materials = tuple(sorted(
+        _material_key(m) for m in data.get("materials", [])
+    ))
+
+    return (
+        data.get("description", ""),
+        _num(data.get("hours", 0)),
+        _num(data.get("hourly_rate", 0)),
+        _num(data.get("profit_percent", 0)),
+        _num(data.get("distance", 0)),
+        materials,
+    )
+
+
+def _settings_key():
+    return tuple(sorted(SETTINGS.items()))
+
+
+class QuoteCache(LRUCache):
+    """Bounded LRU cache of quote results with optional TTL.
+
+    Keys are a canonical form of the request (normalized floats, sorted
+    material lines). The whole cache is dropped as soon as ``SETTINGS``
+    differs from the snapshot the entries were computed with.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        super().__init__(maxsize, ttl)
+        self._settings = _settings_key()
+
+    def _before_access(self):
+        current = _settings_key()
+        if current != self._settings:
+            self._data.clear()
+            self._settings = current
+            self.invalidations += 1
+
+
+quote_cache = QuoteCache()
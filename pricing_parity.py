@@ -0,0 +1,142 @@
+"""Integer-cents vs v3.0 pricing parity check.
+
+Prices random and adversarial quotes (half-cent ties, long decimals,
+tiny/huge values, custom rate profiles) with both ``изчисли_оферта``
+(v3.0, floats) and ``изчисли_оферта_центове`` and fails on any
+difference of a cent or more.
+
+    python pricing_parity.py [--cases 100000] [--seed 1]   # or: flask check-pricing-parity
+"""
+import argparse
+import random
+import sys
+
+import pricing_engine
+from pricing_cents import RateProfile, default_profile, изчисли_оферта_центове
+
+
+# amounts compared cent for cent; everything else must be identical
+MONEY = (
+    ("final_price",),
+    ("costs", "materials"),
+    ("costs", "transport"),
+    ("costs", "base_cost"),
+    ("income", "labor"),
+    ("income", "extra_profit"),
+    ("income", "total_profit"),
+    ("income", "margin_percent"),
+)
+
+# decimals that sit on or next to half-cent boundaries in binary
+NASTY = (
+    0.005, 0.015, 0.025, 0.045, 0.125, 0.135, 0.145, 0.285, 0.335, 0.575,
+    1.005, 1.015, 1.115, 2.675, 4.035, 8.345, 10.005, 1.0049999999999999,
+    0.1, 0.2, 0.3, 0.7, 1.1, 33.33, 66.67, 99.995, 123.455, 1000.005,
+)
+
+
+def _amount(rng, high, decimals):
+    return round(rng.uniform(0, high), rng.choice(decimals))
+
+
+def _value(rng, high, decimals=(0, 1, 2, 3)):
+    roll = rng.random()
+    if roll < 0.15:
+        return rng.choice(NASTY) * rng.choice((1, 1, 10, 100))
+    if roll < 0.2:
+        return rng.choice((0, 0.0, 1, 0.5, 0.25, 0.125))
+    if roll < 0.25:
+        return rng.uniform(0, high)  # full-precision float
+    return _amount(rng, high, decimals)
+
+
+def random_quote(rng):
+    return {
+        "description": rng.choice(("", "Боядисване", "ремонт на баня")),
+        "hours": _value(rng, 80, (0, 1, 2)),
+        "hourly_rate": _value(rng, 120, (0, 1, 2)),
+        "profit_percent": _value(rng, 60, (0, 1, 2)),
+        "distance": _value(rng, 300, (0, 1, 2, 3, 4)),
+        "materials": [
+            {
+                "name": f"m{i}",
+                "unit_price": _value(rng, 500, (2, 2, 3)),
+                "quantity": _value(rng, 50, (0, 0, 1, 2, 3)),
+            }
+            for i in range(rng.choice((0, 1, 2, 3, 5, 8)))
+        ],
+    }
+
+
+def random_profile(rng, n):
+    return RateProfile.build(
+        f"random:{n}",
+        visit_fee=rng.randint(0, 5000) / 100,
+        transport_per_km=rng.choice((1.2, 0.85, 1.0, 2.5, 0.333, 1.015, 0.0)),
+        min_offer=rng.randint(0, 30000) / 100,
+    )
+
+
+def _get(result, path):
+    for key in path:
+        result = result[key]
+    return result
+
+
+def compare(data, profile):
+    """Differences between v3.0 (with the profile as SETTINGS) and cents."""
+    saved = dict(pricing_engine.SETTINGS)
+    pricing_engine.SETTINGS.update(profile.as_settings())
+    try:
+        expected = pricing_engine.изчисли_оферта(data)
+    finally:
+        pricing_engine.SETTINGS.clear()
+        pricing_engine.SETTINGS.update(saved)
+
+    actual = изчисли_оферта_центове(data, profile)
+    problems = []
+
+    for path in MONEY:
+        a, e = _get(actual, path), _get(expected, path)
+        if round(a * 100) != round(e * 100):
+            problems.append(f"{'.'.join(path)}: {a!r} != v3.0 {e!r}")
+
+    for m_a, m_e in zip(actual["materials"], expected["materials"]):
+        if m_a != m_e:
+            problems.append(f"material {m_e['name']}: {m_a!r} != v3.0 {m_e!r}")
+
+    for key in ("client_message", "engine_version", "hours", "distance"):
+        if actual[key] != expected[key]:
+            problems.append(f"{key} differs")
+
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    profiles = [default_profile()] + [random_profile(rng, n) for n in range(20)]
+
+    failures = 0
+    for n in range(args.cases):
+        data = random_quote(rng)
+        profile = profiles[0] if n % 2 else rng.choice(profiles)
+
+        problems = compare(data, profile)
+        if problems:
+            failures += 1
+            if failures <= 10:
+                print(f"FAIL case {n} ({profile.name}): {data}")
+                for p in problems:
+                    print(f"  {p}")
+
+    print(f"Checked {args.cases} quotes across {len(profiles)} profiles: {failures} mismatch(es).")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import math
+from typing import Dict, List, Optional, Union
+
+from pricing_cents import RateProfile, изчисли_оферта_центове
+from pricing_engine import изчисли_решетка
+
+
+AXES = ("hours", "profit_percent", "distance")
+
+COLUMNS = (
+    "final_price", "total_profit", "margin_percent", "extra_profit",
+    "labor", "transport", "base_cost", "materials_cost",
+)
+DEFAULT_COLUMNS = ("final_price", "margin_percent")
+
+MAX_AXIS = 1000
+MAX_POINTS = 100000
+
+# doublings of the search step before a target counts as out of reach
+MAX_DOUBLINGS = 40
+
+
+# =========================
+# GRID SWEEP
+# =========================
+
+def _finite(value, what) -> float:
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"{what} must be a finite number")
+    return value
+
+
+def parse_axis(name, spec) -> List[float]:
+    """A list of values, or ``{"start", "stop", "num"}`` (inclusive)."""
+    if isinstance(spec, dict):
+        start = _finite(spec["start"], f"{name}.start")
+        stop = _finite(spec["stop"], f"{name}.stop")
+        num = int(spec.get("num", 10))
+        if not 1 <= num <= MAX_AXIS:
+            raise ValueError(f"{name}.num must be between 1 and {MAX_AXIS}")
+        if num == 1:
+            return [start]
+        step = (stop - start) / (num - 1)
+        return [round(start + i * step, 10) for i in range(num)]
+
+    if not isinstance(spec, list) or not spec:
+        raise ValueError(f"{name} must be a non-empty list or a start/stop/num range")
+    if len(spec) > MAX_AXIS:
+        raise ValueError(f"{name} has more than {MAX_AXIS} values")
+    return [_finite(v, name) for v in spec]
+
+
+def parse_columns(value) -> List[str]:
+    """A list of column names or one comma-separated string."""
+    if not value:
+        return list(DEFAULT_COLUMNS)
+    if isinstance(value, str):
+        return [name.strip() for name in value.split(",") if name.strip()]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError("columns must be a list of names or a comma-separated string")
+    return value
+
+
+def sweep(data: Dict, grid: Dict, profile: RateProfile,
+          columns: Optional[Union[List[str], str]] = None) -> Dict:
+    """Price ``data`` over the grid in one vectorized pass.
+
+    Each column is a nested list indexed [hours][profit_percent][distance];
+    axes missing from ``grid`` hold the job's own value.
+    """
+    unknown = set(grid) - set(AXES)
+    if unknown:
+        raise ValueError(f"unknown grid axes: {', '.join(sorted(unknown))}")
+
+    columns = parse_columns(columns)
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"unknown columns: {', '.join(sorted(unknown))}")
+
+    axes = {name: parse_axis(name, spec) for name, spec in grid.items()}
+    points = math.prod(len(values) for values in axes.values())
+    if points > MAX_POINTS:
+        raise ValueError(f"grid has {points} points, the limit is {MAX_POINTS}")
+
+    cols = изчисли_решетка(data, settings=profile.as_settings(), **axes)
+
+    return {
+        "axes": {name: axes.get(name, [float(data.get(name, 0))]) for name in AXES},
+        "shape": list(cols["final_price"].shape),
+        "columns": {name: cols[name].tolist() for name in columns},
+    }
+
+
+# =========================
+# BREAK-EVEN SOLVER
+# =========================
+
+def _required_price(target: Dict, base_cost: float, min_offer: float) -> float:
+    """Unfloored price (base + labor + markup) that meets the target.
+
+    Below ``min_offer`` the quote is lifted to the floor while the profit
+    stays ``price - base_cost``, so a margin is reached at a lower price
+    than ``base_cost / (1 - margin)`` whenever the floor binds.
+    """
+    if "price" in target:
+        return _finite(target["price"], "price")
+
+    margin = _finite(target["margin"], "margin")
+    if margin >= 100:
+        raise ValueError("margin must be below 100%")
+    # margin_percent is reported to 0.01, so half a step below rounds up to it
+    margin = (margin - 0.005) / 100
+
+    price = base_cost / (1 - margin)
+    if price < min_offer:
+        price = base_cost + margin * min_offer
+    return price
+
+
+def _reached(result: Dict, target: Dict) -> bool:
+    if "price" in target:
+        return result["final_price"] >= float(target["price"])
+    return result["income"]["margin_percent"] >= float(target["margin"])
+
+
+def _solved(var, target, value, result, profile) -> Dict:
+    return {
+        "for": var,
+        "target": {k: target[k] for k in ("price", "margin") if k in target},
+        "value": value,
+        "reached": _reached(result, target),
+        "at_min_offer": result["final_price"] == profile.min_offer,
+        "final_price": result["final_price"],
+        "total_profit": result["income"]["total_profit"],
+        "margin_percent": result["income"]["margin_percent"],
+    }
+
+
+def solve(data: Dict, profile: RateProfile, target: Dict) -> Dict:
+    """Smallest ``hours`` or ``profit_percent`` that reaches a price or margin.
+
+    ``target`` is ``{"for": "hours" | "profit_percent", "price": P}`` or
+    ``{"for": ..., "margin": M}``. Price and margin both grow with either
+    variable, so the closed-form inverse is a close first guess; the
+    answer is the smallest value, in steps of 0.01, whose quote priced
+    with the cents engine reaches the target. A price at or below
+    ``min_offer`` is met by every quote: 0 hours, or an error for
+    ``profit_percent``, which has no smallest value then.
+    """
+    var = target.get("for")
+    if var not in ("hours", "profit_percent"):
+        raise ValueError("solve.for must be hours or profit_percent")
+    if ("price" in target) == ("margin" in target):
+        raise ValueError("solve needs exactly one of price or margin")
+
+    def price_at(v):
+        return изчисли_оферта_центове({**data, var: v}, profile)
+
+    base = изчисли_оферта_центове(data, profile)
+    base_cost = base["costs"]["base_cost"]
+    price = _required_price(target, base_cost, profile.min_offer)
+
+    if "price" in target and price <= profile.min_offer:
+        # every quote is lifted to min_offer, whatever the variable
+        if var == "profit_percent":
+            raise ValueError("every profit_percent reaches a price at or below min_offer")
+        value = 0.0
+        return _solved(var, target, value, price_at(value), profile)
+
+    if var == "hours":
+        rate = float(data.get("hourly_rate", 0))
+        markup = 1 + float(data.get("profit_percent", 0)) / 100
+        if rate <= 0 or markup <= 0:
+            raise ValueError("hours can't move the price with this rate and markup")
+        value = (price / markup - base_cost) / rate
+    else:
+        subtotal = base_cost + base["income"]["labor"]
+        if subtotal <= 0:
+            raise ValueError("profit_percent can't move a zero-cost quote")
+        value = (price / subtotal - 1) * 100
+
+    # below zero hours the target is already met; a markup may go
+    # negative, but not to -100% or below
+    floor = 0 if var == "hours" else -9999
+    guess = max(math.ceil(round(value * 100, 6)), floor)
+
+    cents, result = _smallest_reaching(
+        lambda c: price_at(c / 100), lambda r: _reached(r, target), guess, floor
+    )
+    return _solved(var, target, cents / 100, result, profile)
+
+
+def _smallest_reaching(price_at, reached, guess, floor):
+    """Smallest whole-cent value >= ``floor`` whose result is ``reached``.
+
+    Gallops from ``guess`` to a bracket, then bisects; the rounded
+    results are monotone in the value. Out of reach, returns the last
+    value tried.
+    """
+    results = {}
+
+    def ok(c):
+        if c not in results:
+            results[c] = price_at(c)
+        return reached(results[c])
+
+    step = 1
+    if ok(guess):
+        hi = guess
+        while True:
+            lo = max(hi - step, floor)
+            if lo == hi:
+                return hi, results[hi]
+            if not ok(lo):
+                break
+            hi = lo
+            step *= 2
+    else:
+        lo = guess
+        for _ in range(MAX_DOUBLINGS):
+            hi = lo + step
+            if ok(hi):
+                break
+            lo = hi
+            step *= 2
+        else:
+            return lo, results[lo]
+
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if ok(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi, results[hi]
+
@@ -0,0 +1,202 @@
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+from flask import current_app, g, request
+from flask_login import current_user
+
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".prof"
+HEADER = "X-Profile-Token"
+
+
+# =========================
+# SAMPLING DECISION
+# =========================
+
+def parse_route_rates(value):
+    """``"/api/analytics=0.2,/api/jobs=0.05"`` -> {route: rate}."""
+    rates = {}
+    for part in (value or "").split(","):
+        if not part.strip():
+            continue
+        route, _, rate = part.rpartition("=")
+        rates[route.strip()] = float(rate)
+    return rates
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else None
+
+
+def _authorized_header():
+    token = current_app.config["PROFILE_TOKEN"]
+    supplied = request.headers.get(HEADER)
+    return bool(token and supplied) and hmac.compare_digest(supplied, token)
+
+
+def _should_profile(route):
+    if _authorized_header():
+        return True
+    if not current_app.config["PROFILE_ENABLED"] or route is None:
+        return False
+
+    rate = current_app.config["PROFILE_ROUTE_RATES"].get(
+        route, current_app.config["PROFILE_SAMPLE_RATE"]
+    )
+    return rate > 0 and random.random() < rate
+
+
+# =========================
+# REQUEST HOOKS
+# =========================
+
+def _start_profile():
+    route = _route()
+    if not _should_profile(route):
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler (or a debugger) already owns this thread
+        return
+
+    g.profiler = profiler
+    g.profile_start = time.perf_counter()
+
+
+def _finish_profile(response):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+
+    profiler.disable()
+    elapsed_ms = (time.perf_counter() - g.pop("profile_start")) * 1000
+
+    user = current_user.get_id() if current_user.is_authenticated else None
+
+    try:
+        path = write_profile(
+            profiler,
+            current_app.config["PROFILE_DIR"],
+            method=request.method,
+            route=_route() or request.path,
+            status=response.status_code,
+            elapsed_ms=elapsed_ms,
+            user_id=user,
+        )
+        rotate(
+            current_app.config["PROFILE_DIR"],
+            max_files=current_app.config["PROFILE_MAX_FILES"],
+            max_bytes=current_app.config["PROFILE_MAX_MB"] * 1024 * 1024,
+        )
+    except OSError:
+        logger.exception("profiling: could not write profile")
+        return response
+
+    response.headers["X-Profile"] = os.path.basename(path)
+    return response
+
+
+def init_app(app):
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+
+
+# =========================
+# STORAGE
+# =========================
+
+_rotate_lock = threading.Lock()
+
+
+def _slug(route):
+    return re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+
+
+def write_profile(profiler, directory, method, route, status, elapsed_ms, user_id=None):
+    """Dump ``profiler`` as a pstats file; metadata lives in the name.
+
+    ``<utc time>-<method>-<route slug>-<status>-<ms>ms[-u<id>].prof``
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    stamp += f"{time.time() % 1:.6f}"[1:]
+    name = f"{stamp}-{method}-{_slug(route)}-{status}-{elapsed_ms:.0f}ms"
+    if user_id is not None:
+        name += f"-u{user_id}"
+    name += f"-{os.getpid()}{SUFFIX}"
+
+    path = os.path.join(directory, name)
+    tmp = path + ".tmp"
+    profiler.dump_stats(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def list_profiles(directory):
+    """Profiles oldest first as (name, size in bytes, mtime)."""
+    try:
+        names = [n for n in os.listdir(directory) if n.endswith(SUFFIX)]
+    except FileNotFoundError:
+        return []
+
+    entries = []
+    for name in names:
+        try:
+            st = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue  # rotated away by another worker
+        entries.append((name, st.st_size, st.st_mtime))
+
+    return sorted(entries, key=lambda e: (e[2], e[0]))
+
+
+def rotate(directory, max_files, max_bytes):
+    """Delete the oldest profiles until both caps hold."""
+    with _rotate_lock:
+        entries = list_profiles(directory)
+        total = sum(size for _, size, _ in entries)
+
+        while entries and (len(entries) > max_files or total > max_bytes):
+            name, size, _ = entries.pop(0)
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+# =========================
+# SUMMARIES
+# =========================
+
+def matching(directory, route=None, user_id=None):
+    """Profile names, oldest first, optionally filtered by route / user."""
+    names = [name for name, _, _ in list_profiles(directory)]
+    if route is not None:
+        slug = f"-{_slug(route)}-"
+        names = [n for n in names if slug in n]
+    if user_id is not None:
+        names = [n for n in names if f"-u{user_id}-" in n]
+    return names
+
+
+def summarize(paths, sort="cumulative", limit=20):
+    """Merge the given profiles and return pstats' top-``limit`` table."""
+    out = io.StringIO()
+    stats = pstats.Stats(*paths, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
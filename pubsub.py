@@ -0,0 +1,169 @@
+import json
+import logging
+import queue
+import select
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+QUEUE_SIZE = 16
+PG_CHANNEL = "handyman_events"
+
+
+# =========================
+# SUBSCRIPTIONS
+# =========================
+
+class Subscription:
+    """One listener's bounded inbox on a channel."""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # messages are "something changed" hints; a full inbox
+            # already guarantees a refresh, so dropping is safe
+            pass
+
+    def get(self, timeout=None):
+        """Next message, or None after ``timeout`` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+# =========================
+# BACKENDS
+# =========================
+
+class LocalBroker:
+    """In-process pub/sub; only reaches subscribers in this worker."""
+
+    def __init__(self):
+        self._subs = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        sub = Subscription(self, channel)
+        with self._lock:
+            self._subs[channel].add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subs.get(sub.channel)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.channel]
+
+    def publish(self, channel, message):
+        self._deliver(channel, message)
+
+    def _deliver(self, channel, message):
+        with self._lock:
+            subs = list(self._subs.get(channel, ()))
+        for sub in subs:
+            sub.put(message)
+
+
+class PostgresBroker(LocalBroker):
+    """Fans messages out across workers with PostgreSQL LISTEN/NOTIFY.
+
+    Each worker keeps one listening connection, opened lazily on the
+    first subscribe so it is never inherited across a fork. Messages
+    from NOTIFY are delivered to the worker's local subscribers.
+    """
+
+    def __init__(self, dsn):
+        super().__init__()
+        self.dsn = dsn
+        self._listener = None
+        self._notify_conn = None
+        self._notify_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def subscribe(self, channel):
+        with self._start_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name="pubsub-listener", daemon=True
+                )
+                self._listener.start()
+        return super().subscribe(channel)
+
+    def publish(self, channel, message):
+        payload = json.dumps([channel, message])
+
+        with self._notify_lock:
+            for attempt in range(2):
+                try:
+                    if self._notify_conn is None or self._notify_conn.closed:
+                        self._notify_conn = self._connect()
+                    with self._notify_conn.cursor() as cur:
+                        cur.execute("SELECT pg_notify(%s, %s)", (PG_CHANNEL, payload))
+                    return
+                except Exception:
+                    if self._notify_conn is not None:
+                        _close(self._notify_conn)
+                    self._notify_conn = None
+                    if attempt:
+                        logger.exception("pubsub: NOTIFY failed")
+
+    def _listen(self):
+        while True:
+            conn = None
+            try:
+                conn = self._connect()
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {PG_CHANNEL}")
+
+                while True:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        note = conn.notifies.pop(0)
+                        channel, message = json.loads(note.payload)
+                        self._deliver(channel, message)
+
+            except Exception:
+                logger.exception("pubsub: listener lost, reconnecting")
+            finally:
+                if conn is not None:
+                    _close(conn)
+            threading.Event().wait(2)
+
+
+def _close(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass  # already broken; nothing left to release
+
+
+def create_broker(backend, database_uri=None):
+    if backend == "local":
+        return LocalBroker()
+    if backend == "postgres":
+        dsn = database_uri.replace("postgresql+psycopg2://", "postgresql://", 1)
+        return PostgresBroker(dsn)
+    raise ValueError(f"unknown PUBSUB_BACKEND: {backend}")
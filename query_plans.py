@@ -0,0 +1,233 @@
+"""Query-plan regression check.
+
+Builds a throwaway SQLite database from the migrations, seeds it, drives
+every API route through the test client and runs ``EXPLAIN QUERY PLAN``
+on each statement the routes issue. Exits non-zero if any statement
+falls back to a full scan of an application table, or if a driven
+request fails (a route that errors early issues fewer statements and
+would otherwise drop out of the check).
+
+    python query_plans.py [--jobs-per-user 250]   # or: flask check-query-plans
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+
+TABLES = ("users", "jobs", "job_materials", "user_stats")
+
+SEED_USERS = 40
+SEED_JOBS_PER_USER = 250
+SEED_MATERIALS_PER_JOB = 3
+
+FULL_SCAN = re.compile(r"\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)")
+
+
+def _seed(db, Job, JobMaterial, User, jobs_per_user=SEED_JOBS_PER_USER):
+    now = datetime.utcnow()
+
+    for u in range(SEED_USERS):
+        user = User(email=f"seed{u}@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.flush()
+
+        jobs = [
+            Job(
+                user_id=user.id,
+                description=f"seed job {i}",
+                hours=2,
+                hourly_rate=30,
+                profit_percent=10,
+                distance=5,
+                total_cost=40,
+                profit_amount=70,
+                final_price=120,
+                client_message="seed",
+                created_at=now - timedelta(hours=i),
+            )
+            for i in range(jobs_per_user)
+        ]
+        db.session.add_all(jobs)
+        db.session.flush()
+
+        db.session.add_all([
+            JobMaterial(
+                job_id=job.id,
+                name=f"material {k}",
+                unit_price=2,
+                quantity=3,
+                total_price=6,
+            )
+            for job in jobs
+            for k in range(SEED_MATERIALS_PER_JOB)
+        ])
+
+    db.session.commit()
+
+
+class _CheckedClient:
+    """Test client wrapper that records requests answered with a 4xx/5xx."""
+
+    def __init__(self, client):
+        self.client = client
+        self.errors = []
+
+    def open(self, method, url, **kwargs):
+        response = self.client.open(url, method=method, **kwargs)
+        if response.status_code >= 400:
+            self.errors.append(f"{method} {url} -> {response.status_code}")
+        return response
+
+    def get(self, url, **kwargs):
+        return self.open("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.open("POST", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.open("DELETE", url, **kwargs)
+
+
+def _drive_routes(client):
+    """Hit every API route once; SQL is captured, failures are recorded."""
+    job = {
+        "hours": 2,
+        "hourly_rate": 30,
+        "profit_percent": 10,
+        "distance": 5,
+        "materials": [{"name": "x", "unit_price": 2, "quantity": 3}],
+    }
+
+    client.post("/api/izchisli", json=job)
+    client.post("/api/izchisli/batch", json=[job, job])
+
+    saved = client.post("/api/jobs", json={
+        **job,
+        "description": "plan check",
+        "total_cost": 40,
+        "profit_amount": 70,
+        "final_price": 120,
+        "client_message": "plan check",
+        "materials": [{**job["materials"][0], "total_price": 6}],
+    }).get_json()
+
+    # a fresh save, then its replay (idempotency key lookup)
+    for _ in range(2):
+        client.post("/api/quotes", json=job, headers={"Idempotency-Key": "plan-check"})
+
+    client.get("/api/materials/suggest?q=x")
+    client.get("/api/jobs/similar?description=seed job&materials=material 1")
+
+    client.post(
+        "/api/jobs/import",
+        data=json.dumps({**job, "client_message": "import", "total_cost": 40,
+                         "profit_amount": 70, "final_price": 120,
+                         "materials": [{**job["materials"][0], "total_price": 6}]}),
+        content_type="application/x-ndjson",
+    )
+
+    client.get("/api/analytics")
+    for bucket in ("day", "week", "month"):
+        client.get(f"/api/analytics/timeseries?bucket={bucket}")
+    client.get("/api/analytics/timeseries?bucket=day&from=2020-01-01&to=2030-01-01")
+    client.get("/api/jobs/recent")
+    # the plans user has three jobs, so two per page leaves a next page
+    first = client.get("/api/jobs?limit=2").get_json()
+    client.get(f"/api/jobs?limit=2&cursor={first['next_cursor']}")
+    client.get("/api/jobs?from=2020-01-01&to=2030-01-01&min_margin=20&q=seed")
+    client.get("/api/jobs/export?format=ndjson").get_data()
+    client.get("/api/jobs/export?format=csv").get_data()
+
+    client.delete(f"/api/jobs/{saved['job_id']}")
+
+
+def run(jobs_per_user=SEED_JOBS_PER_USER):
+    from sqlalchemy import event
+
+    from app import create_app, init_migrate
+    from extensions import db
+    from flask_migrate import upgrade
+    from models import Job, JobMaterial, User
+
+    app = create_app()
+    init_migrate(app)
+
+    migrations_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+    with app.app_context():
+        upgrade(directory=migrations_dir)
+        _seed(db, Job, JobMaterial, User, jobs_per_user)
+
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+
+        captured = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if not executemany and statement.lstrip().upper().startswith(
+                ("SELECT", "UPDATE", "DELETE")
+            ):
+                captured.append((statement, parameters))
+
+        client = _CheckedClient(app.test_client())
+        client.post("/signup", data={"email": "plans@example.com", "password": "pw"})
+
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            _drive_routes(client)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+
+        failures = []
+        raw = db.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            seen = set()
+            for statement, parameters in captured:
+                if statement in seen:
+                    continue
+                seen.add(statement)
+
+                cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+                plan = [row[-1] for row in cursor.fetchall()]
+
+                scans = [
+                    line for line in plan
+                    if (m := FULL_SCAN.search(line)) and m.group(1) in TABLES
+                ]
+                if scans:
+                    failures.append((statement, plan))
+        finally:
+            raw.close()
+
+    print(f"Checked {len(seen)} distinct statements.")
+
+    for error in client.errors:
+        print(f"\nREQUEST FAILED: {error}")
+
+    for statement, plan in failures:
+        print("\nFULL SCAN:\n  " + " ".join(statement.split()))
+        for line in plan:
+            print("    " + line)
+
+    return 1 if failures or client.errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # fewer rows seed faster; ANALYZE still sees the same shape
+    parser.add_argument("--jobs-per-user", type=int, default=SEED_JOBS_PER_USER)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'plans.db')}"
+        os.environ["SIMILAR_JOBS_PATH"] = os.path.join(tmp, "similar_jobs.db")
+        return run(args.jobs_per_user)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
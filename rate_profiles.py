@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from caching import LRUCache
+from pricing_cents import RateProfile, default_profile
+from pricing_engine import SETTINGS
+
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("visit_fee", "transport_per_km", "min_offer")
+
+
+class ProfileStore:
+    """Per-plan / per-user rate profiles from a JSON file, hot-reloaded.
+
+    ::
+
+        {"plans": {"pro": {"visit_fee": 20, "min_offer": 150}},
+         "users": {"42": {"transport_per_km": 0.9}}}
+
+    Unset fields fall back user -> plan -> ``SETTINGS``. The file's
+    mtime is checked at most every ``check_interval`` seconds, so an edit
+    reaches every worker within that window without a restart. A file
+    that fails to parse or validate keeps the last good profiles. Users
+    without overrides get the shared default profile object.
+    """
+
+    def __init__(self, path=None, check_interval=5.0):
+        self.configure(path, check_interval)
+
+    def configure(self, path=None, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._plans = {}
+        self._users = {}
+        self._mtime = None
+        self._next_check = 0.0
+        self._resolved = LRUCache(maxsize=10000)
+
+        self.reloads = 0
+        self.errors = 0
+
+    # -----------------------
+    # LOADING
+    # -----------------------
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self.path is None or now < self._next_check:
+            return
+
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+
+            if mtime != self._mtime:
+                self._load(mtime)
+
+    def _load(self, mtime):
+        try:
+            if mtime is None:
+                plans, users = {}, {}
+            else:
+                with open(self.path, encoding="utf-8") as f:
+                    raw = json.load(f)
+                plans = {str(k): _overrides(v) for k, v in raw.get("plans", {}).items()}
+                users = {str(k): _overrides(v) for k, v in raw.get("users", {}).items()}
+
+                # build every profile once so a bad value fails the whole load
+                for name, entry in plans.items():
+                    _build(f"plan:{name}", {}, entry)
+                for uid, entry in users.items():
+                    _build(f"user:{uid}", {}, entry)
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            self.errors += 1
+            logger.error("rate profiles: keeping previous profiles, %s: %s", self.path, e)
+            return
+
+        self._plans, self._users = plans, users
+        self._mtime = mtime
+        self._resolved.clear()
+        self.reloads += 1
+
+    def reload(self):
+        """Re-read the file now, ignoring the check interval."""
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except (FileNotFoundError, TypeError):
+                mtime = None
+            self._load(mtime)
+
+    # -----------------------
+    # LOOKUP
+    # -----------------------
+
+    def for_user(self, user_id, plan=None) -> RateProfile:
+        self._maybe_reload()
+
+        user = self._users.get(str(user_id))
+        plan_entry = self._plans.get(plan) if plan is not None else None
+        if user is None and plan_entry is None:
+            return default_profile()
+
+        settings = tuple(sorted(SETTINGS.items()))
+        key = (str(user_id), plan, settings)
+
+        profile = self._resolved.get(key)
+        if profile is None:
+            name = f"user:{user_id}" if user is not None else f"plan:{plan}"
+            profile = _build(name, plan_entry or {}, user or {})
+            self._resolved.put(key, profile)
+        return profile
+
+    def stats(self):
+        return {
+            "plans": len(self._plans),
+            "users": len(self._users),
+            "reloads": self.reloads,
+            "errors": self.errors,
+        }
+
+
+def _overrides(entry):
+    unknown = set(entry) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"unknown rate fields: {', '.join(sorted(unknown))}")
+    return dict(entry)
+
+
+def _build(name, plan_entry, user_entry):
+    values = {field: SETTINGS[field] for field in FIELDS}
+    values.update(plan_entry)
+    values.update(user_entry)
+    return RateProfile.build(name, **values)
+
+
+store = ProfileStore()
@@ -0,0 +1,274 @@
+import heapq
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from sqlalchemy import select
+
+import job_listing
+import user_stats
+from extensions import db
+from models import Job, JobMaterial
+
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+MAX_QUERY_TERMS = 32
+
+_WORD = re.compile(r"\w\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    docs INTEGER NOT NULL,
+    total_len INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    user_id INTEGER NOT NULL,
+    job_id INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    terms TEXT NOT NULL,
+    PRIMARY KEY (user_id, job_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    user_id INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    job_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (user_id, term, job_id)
+) WITHOUT ROWID;
+"""
+
+
+@contextmanager
+def _transaction(conn):
+    # IMMEDIATE: take the write lock before reading the user's counters
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def tokens(description, material_names=()):
+    """Bag of words over the description and the material names."""
+    text = " ".join([description or "", *(str(n) for n in material_names if n)])
+    return Counter(_WORD.findall(text.casefold()))
+
+
+class SimilarJobsIndex:
+    """BM25 index of each user's jobs (description + material names).
+
+    Lives in its own SQLite file under ``instance/`` so every worker
+    shares it and a restart finds it ready. Each indexed user row records
+    the ``user_stats`` data version it reflects: saves and deletes patch
+    the index in place and advance that version when they are the next
+    write; anything else (imports, other hosts, a missed hook) leaves a
+    mismatch and the user is rebuilt from the database on the next
+    search. Users are only indexed once they search.
+    """
+
+    def __init__(self, path=None):
+        self.configure(path)
+
+    def configure(self, path=None):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        # one connection per thread, reopened in forked workers
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _state(self, conn, user_id):
+        return conn.execute(
+            "SELECT version, docs, total_len FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+
+    # -----------------------
+    # WRITES
+    # -----------------------
+
+    def _insert(self, conn, user_id, job_id, bag):
+        conn.executemany(
+            "INSERT INTO postings (user_id, term, job_id, tf) VALUES (?, ?, ?, ?)",
+            [(user_id, term, job_id, tf) for term, tf in bag.items()],
+        )
+        length = sum(bag.values())
+        conn.execute(
+            "INSERT INTO docs (user_id, job_id, length, terms) VALUES (?, ?, ?, ?)",
+            (user_id, job_id, length, " ".join(bag)),
+        )
+        return length
+
+    def _delete(self, conn, user_id, job_id):
+        row = conn.execute(
+            "SELECT length, terms FROM docs WHERE user_id = ? AND job_id = ?",
+            (user_id, job_id),
+        ).fetchone()
+        if row is None:
+            return None
+
+        length, terms = row
+        conn.executemany(
+            "DELETE FROM postings WHERE user_id = ? AND term = ? AND job_id = ?",
+            [(user_id, term, job_id) for term in terms.split()],
+        )
+        conn.execute("DELETE FROM docs WHERE user_id = ? AND job_id = ?", (user_id, job_id))
+        return length
+
+    def rebuild(self, user_id):
+        """Re-index every job of the user from the database."""
+        version = user_stats.data_version(user_id)
+
+        names = defaultdict(list)
+        for job_id, name in db.session.execute(
+            select(JobMaterial.job_id, JobMaterial.name)
+            .join(Job, Job.id == JobMaterial.job_id)
+            .where(Job.user_id == user_id)
+        ):
+            names[job_id].append(name)
+
+        jobs = db.session.execute(
+            select(Job.id, Job.description).where(Job.user_id == user_id)
+        ).all()
+
+        conn = self._conn()
+        with _transaction(conn):
+            conn.execute("DELETE FROM postings WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM docs WHERE user_id = ?", (user_id,))
+
+            total_len = 0
+            for job_id, description in jobs:
+                total_len += self._insert(conn, user_id, job_id, tokens(description, names[job_id]))
+
+            conn.execute(
+                "INSERT OR REPLACE INTO users (user_id, version, docs, total_len) "
+                "VALUES (?, ?, ?, ?)",
+                (user_id, version, len(jobs), total_len),
+            )
+
+    def _patch(self, user_id, job_id, bag=None):
+        conn = self._conn()
+        if self._state(conn, user_id) is None:
+            return  # not indexed yet: built on first search
+
+        # the write being recorded is committed, so this is its version
+        version = user_stats.data_version(user_id)
+
+        with _transaction(conn):
+            state = self._state(conn, user_id)
+            if state is None:
+                return
+            indexed_version, docs, total_len = state
+
+            removed = self._delete(conn, user_id, job_id)
+            if removed is not None:
+                docs, total_len = docs - 1, total_len - removed
+            if bag is not None:
+                total_len += self._insert(conn, user_id, job_id, bag)
+                docs += 1
+
+            # a save in the same group commit may already have advanced it
+            if indexed_version in (version - 1, version):
+                indexed_version = version
+
+            conn.execute(
+                "UPDATE users SET version = ?, docs = ?, total_len = ? WHERE user_id = ?",
+                (indexed_version, docs, total_len, user_id),
+            )
+
+    def job_saved(self, user_id, job_id, description, material_names):
+        try:
+            self._patch(user_id, job_id, tokens(description, material_names))
+        except sqlite3.Error:
+            logger.exception("similar jobs: could not index job %s", job_id)
+
+    def job_deleted(self, user_id, job_id):
+        try:
+            self._patch(user_id, job_id)
+        except sqlite3.Error:
+            logger.exception("similar jobs: could not unindex job %s", job_id)
+
+    # -----------------------
+    # SEARCH
+    # -----------------------
+
+    def search(self, user_id, description, material_names=(), k=10):
+        """Top-``k`` job summaries (``job_listing.summary``) plus a score."""
+        bag = tokens(description, material_names)
+        terms = [t for t, _ in bag.most_common(MAX_QUERY_TERMS)]
+        if not terms:
+            return []
+
+        conn = self._conn()
+        state = self._state(conn, user_id)
+        if state is None or state[0] != user_stats.data_version(user_id):
+            self.rebuild(user_id)
+            state = self._state(conn, user_id)
+
+        _, docs, total_len = state
+        if not docs:
+            return []
+        avg_len = total_len / docs
+
+        rows = conn.execute(
+            "SELECT p.term, p.job_id, p.tf, d.length FROM postings p "
+            "JOIN docs d ON d.user_id = p.user_id AND d.job_id = p.job_id "
+            f"WHERE p.user_id = ? AND p.term IN ({', '.join('?' * len(terms))})",
+            (user_id, *terms),
+        ).fetchall()
+
+        df = Counter(term for term, _, _, _ in rows)
+        scores = Counter()
+        for term, job_id, tf, length in rows:
+            idf = math.log(1 + (docs - df[term] + 0.5) / (df[term] + 0.5))
+            norm = tf + K1 * (1 - B + B * length / avg_len)
+            scores[job_id] += bag[term] * idf * tf * (K1 + 1) / norm
+
+        # a few spare in case the index still lists a just-deleted job
+        best = heapq.nlargest(k + 5, scores.items(), key=lambda item: item[1])
+        if not best:
+            return []
+
+        jobs = {
+            job.id: job
+            for job in Job.query.filter(
+                Job.user_id == user_id,
+                Job.id.in_([job_id for job_id, _ in best]),
+            )
+        }
+
+        results = []
+        for job_id, score in best:
+            job = jobs.get(job_id)
+            if job is not None:
+                results.append({**job_listing.summary(job), "score": round(score, 4)})
+        return results[:k]
+
+
+index = SimilarJobsIndex()
@@ -0,0 +1,98 @@
+import json
+
+from flask import Blueprint, Response, current_app, request, stream_with_context
+from flask_login import login_required, current_user
+
+import user_stats
+from api import analytics_payload, recent_payload
+from extensions import db
+
+
+bp = Blueprint("stream", __name__)
+
+
+# =========================
+# API: ANALYTICS STREAM (SSE)
+# =========================
+
+def _sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False))
+    return "\n".join(lines) + "\n\n"
+
+
+def analytics_events(user_id, last_event_id=None):
+    """Yield SSE frames for one user until the client disconnects.
+
+    Pushes analytics plus a recent-jobs delta whenever the user's data
+    version moves, and a ping every SSE_HEARTBEAT seconds so proxies keep
+    the connection open and the page can spot a dead stream. Each push
+    ends its DB transaction so the stream never pins a snapshot.
+    """
+    heartbeat = current_app.config["SSE_HEARTBEAT"]
+    sub = current_app.extensions["broker"].subscribe(f"user:{user_id}")
+
+    try:
+        yield "retry: 5000\n\n"
+
+        sent_version = last_event_id
+        sent_ids = None
+
+        while True:
+            version = str(user_stats.data_version(user_id))
+
+            if version != sent_version:
+                recent = recent_payload(user_id)
+                ids = [j["id"] for j in recent]
+
+                if sent_ids is None:
+                    added = recent
+                    removed = []
+                else:
+                    added = [j for j in recent if j["id"] not in sent_ids]
+                    removed = [i for i in sent_ids if i not in ids]
+
+                payload = analytics_payload(user_id)
+                db.session.remove()
+
+                yield _sse("analytics", payload, version)
+                yield _sse("recent", {
+                    "added": added,
+                    "removed": removed,
+                    "order": ids,
+                    "reset": sent_ids is None,
+                })
+
+                sent_version = version
+                sent_ids = set(ids)
+            else:
+                db.session.remove()
+
+            if sub.get(timeout=heartbeat) is None:
+                yield _sse("ping", {})
+    finally:
+        sub.close()
+        db.session.remove()
+
+
+@bp.route("/api/stream/analytics")
+@login_required
+def stream_analytics():
+    # needs an async/threaded worker class (gevent, gthread): each open
+    # stream occupies a worker thread
+    events = analytics_events(
+        current_user.id,
+        request.headers.get("Last-Event-ID"),
+    )
+
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
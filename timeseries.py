@@ -0,0 +1,183 @@
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import String
+
+from extensions import db
+from models import Job, JobMaterial
+
+
+BUCKETS = ("day", "week", "month")
+
+
+# =========================
+# DIALECT-AWARE DATE BUCKET
+# =========================
+
+class date_bucket(FunctionElement):
+    """Truncate a timestamp to the start of its day / ISO week / month.
+
+    Renders to ``YYYY-MM-DD`` text on every supported dialect so rows
+    group and sort the same way.
+    """
+    type = String()
+    # the unit is not part of the cache key
+    inherit_cache = False
+
+    def __init__(self, unit, expr):
+        if unit not in BUCKETS:
+            raise ValueError(f"unknown bucket: {unit}")
+        self.unit = unit
+        super().__init__(expr)
+
+
+@compiles(date_bucket, "sqlite")
+def _bucket_sqlite(element, compiler, **kw):
+    expr = compiler.process(list(element.clauses)[0], **kw)
+    if element.unit == "day":
+        return f"date({expr})"
+    if element.unit == "week":
+        # next Sunday (or today), then back to that week's Monday
+        return f"date({expr}, 'weekday 0', '-6 days')"
+    return f"date({expr}, 'start of month')"
+
+
+@compiles(date_bucket, "postgresql")
+def _bucket_postgresql(element, compiler, **kw):
+    expr = compiler.process(list(element.clauses)[0], **kw)
+    return f"to_char(date_trunc('{element.unit}', {expr}), 'YYYY-MM-DD')"
+
+
+@compiles(date_bucket)
+def _bucket_default(element, compiler, **kw):
+    raise NotImplementedError(
+        f"date_bucket is not implemented for {compiler.dialect.name}"
+    )
+
+
+# =========================
+# QUERIES
+# =========================
+
+def _job_rows(user_id=None, start=None, end=None):
+    """Jobs with their materials total, one row per job.
+
+    Materials are summed by a correlated lookup on ``job_materials.job_id``
+    so the outer aggregates never see a job twice and never scan the
+    whole materials table.
+    """
+    materials = (
+        select(func.coalesce(func.sum(JobMaterial.total_price), 0))
+        .where(JobMaterial.job_id == Job.id)
+        .correlate(Job)
+        .scalar_subquery()
+    )
+
+    stmt = select(
+        Job.user_id,
+        Job.created_at,
+        Job.final_price,
+        Job.profit_amount,
+        materials.label("materials"),
+    )
+
+    if user_id is not None:
+        stmt = stmt.where(Job.user_id == user_id)
+    if start is not None:
+        stmt = stmt.where(Job.created_at >= datetime.combine(start, time.min))
+    if end is not None:
+        stmt = stmt.where(
+            Job.created_at < datetime.combine(end + timedelta(days=1), time.min)
+        )
+
+    return stmt.subquery()
+
+
+def _low_margin(rows, threshold=0.25):
+    # conditional count in the same pass as the sums
+    return func.sum(
+        case(
+            (
+                (rows.c.final_price > 0)
+                & (rows.c.profit_amount < rows.c.final_price * threshold),
+                1,
+            ),
+            else_=0,
+        )
+    )
+
+
+def totals(user_id=None):
+    """Lifetime totals per user in a single grouped query.
+
+    Returns ``{user_id: {...}}``; users without jobs are absent.
+    """
+    rows = _job_rows(user_id)
+
+    stmt = (
+        select(
+            rows.c.user_id,
+            func.count(),
+            func.coalesce(func.sum(rows.c.profit_amount), 0),
+            func.coalesce(func.sum(rows.c.final_price), 0),
+            func.coalesce(func.sum(rows.c.materials), 0),
+        )
+        .group_by(rows.c.user_id)
+    )
+
+    return {
+        uid: {
+            "total_jobs": jobs,
+            "total_profit": float(profit),
+            "total_revenue": float(revenue),
+            "total_materials": float(materials),
+        }
+        for uid, jobs, profit, revenue, materials in db.session.execute(stmt)
+    }
+
+
+def timeseries(user_id, bucket="day", start=None, end=None):
+    """Revenue, profit, materials and margin per time bucket.
+
+    ``start`` and ``end`` are inclusive dates. One grouped query over the
+    user's jobs in the range.
+    """
+    rows = _job_rows(user_id, start, end)
+    period = date_bucket(bucket, rows.c.created_at).label("period")
+
+    stmt = (
+        select(
+            period,
+            func.count(),
+            func.coalesce(func.sum(rows.c.final_price), 0),
+            func.coalesce(func.sum(rows.c.profit_amount), 0),
+            func.coalesce(func.sum(rows.c.materials), 0),
+            _low_margin(rows),
+        )
+        .group_by(period)
+        .order_by(period)
+    )
+
+    points = []
+    for period, jobs, revenue, profit, materials, low in db.session.execute(stmt):
+        revenue = float(revenue)
+        profit = float(profit)
+        points.append({
+            "period": period,
+            "jobs": jobs,
+            "revenue": round(revenue, 2),
+            "profit": round(profit, 2),
+            "materials": round(float(materials), 2),
+            "margin": round(profit / revenue * 100, 2) if revenue > 0 else 0,
+            "low_margin_jobs": int(low or 0),
+        })
+
+    return points
+
+
+def parse_date(value):
+    if not value:
+        return None
+    return date.fromisoformat(value[:10])
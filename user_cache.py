@@ -0,0 +1,54 @@
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from caching import LRUCache
+from extensions import db
+from models import User
+
+
+class CachedUser(UserMixin):
+    """Detached, read-only stand-in for ``User`` on authenticated requests.
+
+    Carries only what request handling needs, so ``load_user`` can serve
+    it from memory without touching the ``users`` table.
+    """
+
+    def __init__(self, id, email, plan):
+        self.id = id
+        self.email = email
+        self.plan = plan
+
+    def __repr__(self):
+        return f"<CachedUser {self.id}>"
+
+
+cache = LRUCache(maxsize=10000, ttl=60)
+
+
+def load(user_id):
+    """Return a CachedUser for ``user_id``, or None if there is no such user."""
+    user_id = int(user_id)
+
+    cached = cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+
+    cached = CachedUser(user.id, user.email, user.plan)
+    cache.put(user_id, cached)
+    return cached
+
+
+def invalidate(user_id):
+    cache.invalidate(int(user_id))
+
+
+# any ORM write to a user (plan change, email change, delete) drops the
+# entry in this worker; other workers catch up within the TTL
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    invalidate(target.id)
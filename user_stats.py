@@ -0,0 +1,111 @@
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+import db_routing
+import timeseries
+from extensions import db
+from models import UserStats
+
+
+# =========================
+# INCREMENTAL UPDATES
+# =========================
+
+def apply_delta(user_id, jobs=0, profit=0.0, revenue=0.0, materials=0.0):
+    """Add a delta to the user's rollup inside the current transaction.
+
+    The caller flushes its job changes first and commits afterwards, so
+    the rollup and the job rows land together. A user without a rollup
+    row yet gets one rebuilt from the (already flushed) job rows.
+    """
+    delta = (jobs, profit, revenue, materials)
+    if _add(user_id, *delta):
+        return
+
+    try:
+        # a savepoint, so losing the race below keeps the caller's job rows
+        with db.session.begin_nested():
+            rebuild(user_id)
+    except IntegrityError:
+        # a concurrent first save inserted the row (from its own view of
+        # the jobs, without ours): add to it like any later save
+        _add(user_id, *delta)
+
+
+def _add(user_id, jobs, profit, revenue, materials):
+    return (
+        UserStats.query
+        .filter_by(user_id=user_id)
+        .update(
+            {
+                UserStats.total_jobs: UserStats.total_jobs + jobs,
+                UserStats.total_profit: UserStats.total_profit + profit,
+                UserStats.total_revenue: UserStats.total_revenue + revenue,
+                UserStats.total_materials: UserStats.total_materials + materials,
+                UserStats.version: UserStats.version + 1,
+                UserStats.updated_at: datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
+    )
+
+
+# =========================
+# FULL RECOMPUTE / BACKFILL
+# =========================
+
+def rebuild(user_id=None):
+    """Recompute rollups from jobs / job_materials.
+
+    With ``user_id`` only that user's row is rebuilt. Returns the number
+    of rows written. The caller commits. Data versions only ever move
+    forward, so ETags handed out before a rebuild can't match after it.
+    """
+    rows = timeseries.totals(user_id)
+
+    q = UserStats.query
+    if user_id is not None:
+        q = q.filter_by(user_id=user_id)
+
+    versions = dict(q.with_entities(UserStats.user_id, UserStats.version))
+
+    for uid in set(versions) | ({user_id} if user_id is not None else set()):
+        rows.setdefault(uid, {
+            "total_jobs": 0,
+            "total_profit": 0.0,
+            "total_revenue": 0.0,
+            "total_materials": 0.0,
+        })
+
+    q.delete(synchronize_session=False)
+
+    for uid, values in rows.items():
+        db.session.add(
+            UserStats(user_id=uid, version=versions.get(uid, 0) + 1, **values)
+        )
+
+    return len(rows)
+
+
+def get_stats(user_id):
+    """Single primary-key lookup; builds the row on first access."""
+    stats = db.session.get(UserStats, user_id)
+
+    if stats is None:
+        with db_routing.use_primary():
+            try:
+                rebuild(user_id)
+                db.session.commit()
+            except IntegrityError:
+                # a concurrent first access (parallel page requests) inserted
+                # the row first; its rebuild is as good as ours
+                db.session.rollback()
+            stats = db.session.get(UserStats, user_id)
+
+    return stats
+
+
+def data_version(user_id):
+    """Version of the user's job data; bumped by every write."""
+    return get_stats(user_id).version